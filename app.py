@@ -1,58 +1,154 @@
 
 import os
+import atexit
 import json
 import io
 import base64
 import hashlib
 import re
+import tempfile
+import threading
 from datetime import datetime
+from types import SimpleNamespace
 from uuid import uuid4
 
 
 from flask_wtf import CSRFProtect
 
 import pyotp
-import qrcode
 
-import boto3
 import bcrypt
 from botocore.exceptions import ClientError
 from boto3.dynamodb.conditions import Key, Attr
-from cryptography.fernet import Fernet
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, make_response
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, session, jsonify, make_response
 from dotenv import load_dotenv
+from werkzeug.local import LocalProxy
+
+import assets
+import entry_cipher
+from audit import AuditLog
+from breach_check import BreachIndex
+from dynamo_guard import CircuitOpenError
+from dynamo_resources import DynamoDBResources
+from envelope import generate_data_key, new_salt, password_kek, recovery_kek, unwrap_key, wrap_key, wrapped_key_attributes
+import compression
+import profiling
+import server_timing
+from server_timing import span
+from readiness import CANARY_KEY, ReadinessChecker
+from rate_limit import MemoryBucketStore, TokenBucketLimiter, client_ip
+from session_store import DynamoDBSessionStore, MemorySessionStore, ServerSideSessionInterface
+from single_flight import SingleFlight
+from vault_health import VaultHealth, build_report, fingerprint, fingerprint_key, strength_score
+from vault_pages import PAGE_PREFIX, PackedVault, PageConflict
 
 
 load_dotenv()
 
-app = Flask(__name__)
 
+def config_from_env():
+    """Settings from environment variables; ``create_app(config)`` can override any of them"""
+    return {
+        'SECRET_KEY': os.getenv('SECRET_KEY'),
+        
+        # Session cookie security
+        'SESSION_COOKIE_SECURE': os.getenv('FLASK_ENV') == 'production',  # Only in production with HTTPS
+        'SESSION_COOKIE_HTTPONLY': True,
+        'SESSION_COOKIE_SAMESITE': 'Lax',  # CSRF protection while allowing navigation
+        
+        # DynamoDB
+        'AWS_REGION': os.getenv('AWS_REGION', 'us-east-1'),
+        'AWS_ENDPOINT': os.getenv('AWS_ENDPOINT'),
+        'DYNAMODB_USERS_TABLE': os.getenv('DYNAMODB_USERS_TABLE', 'PasswordManagerV2-Users'),
+        'DYNAMODB_PASSWORDS_TABLE': os.getenv('DYNAMODB_PASSWORDS_TABLE', 'PasswordManagerV2-Passwords'),
+        'DYNAMODB_SESSIONS_TABLE': os.getenv('DYNAMODB_SESSIONS_TABLE', 'PasswordManagerV2-Sessions'),
+        'DYNAMODB_AUDIT_TABLE': os.getenv('DYNAMODB_AUDIT_TABLE', 'PasswordManagerV2-Audit'),
+        
+        # Per-request timing (Server-Timing header and slow request logging)
+        'SERVER_TIMING_ENABLED': os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true',
+        'SLOW_REQUEST_LOG_MS': int(os.getenv('SLOW_REQUEST_LOG_MS', '0')),
+        
+        # Sampled cProfile/stack profiling (see profiling.py); off unless a rate or header secret is set
+        'PROFILE_SAMPLE_RATE': float(os.getenv('PROFILE_SAMPLE_RATE', '0')),
+        'PROFILE_HEADER_SECRET': os.getenv('PROFILE_HEADER_SECRET', ''),
+        'PROFILE_DIR': os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'passwordmanager-profiles'),
+        'PROFILE_KEEP': int(os.getenv('PROFILE_KEEP', '20')),
+        'PROFILE_FLUSH_SECONDS': int(os.getenv('PROFILE_FLUSH_SECONDS', '60')),
+        
+        # Login throttling ('attempts/seconds'); EB puts one load balancer in front of us
+        'LOGIN_RATE_LIMIT_IP': os.getenv('LOGIN_RATE_LIMIT_IP', '30/300'),
+        'LOGIN_RATE_LIMIT_USER': os.getenv('LOGIN_RATE_LIMIT_USER', '10/300'),
+        'TRUSTED_PROXY_COUNT': int(os.getenv('TRUSTED_PROXY_COUNT', '1')),
+        
+        # Session storage: 'memory' (single instance), 'dynamodb' (shared) or 'cookie' (Flask default)
+        'SESSION_BACKEND': os.getenv('SESSION_BACKEND', 'memory').lower(),
+        'SESSION_TTL_SECONDS': int(os.getenv('SESSION_TTL_SECONDS', str(12 * 3600))),
+        'SESSION_MAX_ENTRIES': int(os.getenv('SESSION_MAX_ENTRIES', '50000')),
+        
+        # gzip/brotli response compression
+        'COMPRESSION_ENABLED': os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true',
+        'COMPRESSION_MIN_SIZE': int(os.getenv('COMPRESSION_MIN_SIZE', '500')),
+        'COMPRESSION_LEVEL': int(os.getenv('COMPRESSION_LEVEL', '6')),
+        'BROTLI_QUALITY': int(os.getenv('BROTLI_QUALITY', '5')),
+        
+        # Offline breached password index built with `python breach_check.py build` (unset = no check)
+        'BREACHED_PASSWORDS_FILE': os.getenv('BREACHED_PASSWORDS_FILE', ''),
+        
+        # Server-side secret for the TOTP recovery wrap of vault data keys (see envelope.py);
+        # defaults to SECRET_KEY
+        'RECOVERY_WRAP_SECRET': os.getenv('RECOVERY_WRAP_SECRET'),
+        
+        # Background DynamoDB readiness checks for /ready (seconds)
+        'READINESS_INTERVAL': int(os.getenv('READINESS_INTERVAL', '15')),
+        'READINESS_MAX_AGE': int(os.getenv('READINESS_MAX_AGE', '45')),
+        
+        # Vault storage: 'items' (one item per entry) or 'packed' (encrypted pages, see vault_pages.py)
+        'VAULT_LAYOUT': os.getenv('VAULT_LAYOUT', 'items').lower(),
+        
+        # DynamoDB call budget: botocore retries/timeouts, per-table circuit breaker, hedged reads (see dynamo_guard.py)
+        'DYNAMODB_MAX_ATTEMPTS': int(os.getenv('DYNAMODB_MAX_ATTEMPTS', '3')),
+        'DYNAMODB_CONNECT_TIMEOUT': float(os.getenv('DYNAMODB_CONNECT_TIMEOUT', '2')),
+        'DYNAMODB_READ_TIMEOUT': float(os.getenv('DYNAMODB_READ_TIMEOUT', '5')),
+        'DYNAMODB_BREAKER_FAILURE_RATIO': float(os.getenv('DYNAMODB_BREAKER_FAILURE_RATIO', '0.5')),
+        'DYNAMODB_BREAKER_MIN_CALLS': int(os.getenv('DYNAMODB_BREAKER_MIN_CALLS', '10')),
+        'DYNAMODB_BREAKER_WINDOW': int(os.getenv('DYNAMODB_BREAKER_WINDOW', '30')),
+        'DYNAMODB_BREAKER_OPEN_SECONDS': int(os.getenv('DYNAMODB_BREAKER_OPEN_SECONDS', '15')),
+        'DYNAMODB_HEDGED_READS': os.getenv('DYNAMODB_HEDGED_READS', 'false').lower() == 'true',
+        
+        # Security audit log (see audit.py): event retention, in-memory queue bound, fallback spool file
+        'AUDIT_RETENTION_DAYS': int(os.getenv('AUDIT_RETENTION_DAYS', '90')),
+        'AUDIT_QUEUE_SIZE': int(os.getenv('AUDIT_QUEUE_SIZE', '10000')),
+        'AUDIT_SPOOL_FILE': os.getenv('AUDIT_SPOOL_FILE') or os.path.join(tempfile.gettempdir(), 'passwordmanager-audit-spool.jsonl'),
+        'AUDIT_SPOOL_MAX_BYTES': int(os.getenv('AUDIT_SPOOL_MAX_BYTES', str(10 * 1024 * 1024))),
+    }
 
-secret_key = os.getenv('SECRET_KEY') or os.environ.get('SECRET_KEY')
 
+bp = Blueprint('main', __name__)
+csrf = CSRFProtect()
 
-if not secret_key:
- 
-    import sys
-    print("ERROR: SECRET_KEY environment variable is not set!", file=sys.stderr)
-    print(f"Available environment variables: {sorted(list(os.environ.keys()))}", file=sys.stderr)
-    print(f"SECRET_KEY value: {repr(os.getenv('SECRET_KEY'))}", file=sys.stderr)
-    print(f"FLASK_ENV: {os.getenv('FLASK_ENV')}", file=sys.stderr)
-    print(f"AWS_REGION: {os.getenv('AWS_REGION')}", file=sys.stderr)
-    raise ValueError("SECRET_KEY is required. Please set it in Elastic Beanstalk environment variables using: eb setenv SECRET_KEY=your-key -e secured-orbit-env")
+# Sparse GSI on the passwords table for per-folder listings (see list_vault)
+FOLDER_INDEX = 'FolderIndex'
+MAX_FOLDER_LENGTH = 64
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 32
 
-app.secret_key = secret_key
 
-# Configure session cookie security
-app.config['SESSION_COOKIE_SECURE'] = os.getenv('FLASK_ENV') == 'production'  # Only in production with HTTPS
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # CSRF protection while allowing navigation
+def _service(name):
+    # Module-level handle on the current app's collaborator (see create_app); tests monkeypatch these
+    return LocalProxy(lambda: getattr(current_app.extensions['password_manager'], name))
 
 
-csrf = CSRFProtect(app)
+users_table = _service('users_table')
+passwords_table = _service('passwords_table')
+readiness_checker = _service('readiness_checker')
+audit_log = _service('audit_log')
+vault_reads = _service('vault_reads')
+login_ip_limiter = _service('login_ip_limiter')
+login_user_limiter = _service('login_user_limiter')
+session_store = _service('session_store')
 
 
-@app.before_request
+@bp.before_app_request
 def force_https():
     if os.getenv('FLASK_ENV') != 'production':
         return None
@@ -73,7 +169,7 @@ def add_no_cache_headers(response):
     return response
 
 
-@app.after_request
+@bp.after_app_request
 def set_security_headers(response):
 
     response.headers['X-Frame-Options'] = 'DENY'
@@ -105,38 +201,23 @@ def set_security_headers(response):
     
     response.headers.pop('Server', None)
     
+    if current_app.config.get('SERVER_TIMING_ENABLED'):
+        response = server_timing.apply_server_timing(response)
+    
     return response
 
 
-AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
-AWS_ENDPOINT = os.getenv('AWS_ENDPOINT', None)
-DYNAMODB_USERS_TABLE = os.getenv('DYNAMODB_USERS_TABLE', 'PasswordManagerV2-Users')
-DYNAMODB_PASSWORDS_TABLE = os.getenv('DYNAMODB_PASSWORDS_TABLE', 'PasswordManagerV2-Passwords')
-
-# DynamoDB 
-dynamodb_config = {
-    'region_name': AWS_REGION
-}
-if AWS_ENDPOINT:
-    dynamodb_config['endpoint_url'] = AWS_ENDPOINT
-
-dynamodb = boto3.resource('dynamodb', **dynamodb_config)
-dynamodb_client = boto3.client('dynamodb', **dynamodb_config)
-
-# Tables
-users_table = dynamodb.Table(DYNAMODB_USERS_TABLE)
-passwords_table = dynamodb.Table(DYNAMODB_PASSWORDS_TABLE)
-
-
 def is_ci_cd_mode():
     aws_key = os.getenv('AWS_ACCESS_KEY_ID', '')
     return aws_key in ('test-access-key', '') or os.getenv('CI') == 'true' or os.getenv('GITHUB_ACTIONS') == 'true'
 
 
-def init_dynamodb_tables():
+def init_dynamodb_tables(app):
+    config = app.config
+    dynamodb_client = app.extensions['password_manager'].dynamodb.client
     tables = [
         {
-            'TableName': DYNAMODB_USERS_TABLE,
+            'TableName': config['DYNAMODB_USERS_TABLE'],
             'KeySchema': [
                 {'AttributeName': 'username', 'KeyType': 'HASH'}
             ],
@@ -158,27 +239,73 @@ def init_dynamodb_tables():
             ]
         },
         {
-            'TableName': DYNAMODB_PASSWORDS_TABLE,
+            'TableName': config['DYNAMODB_PASSWORDS_TABLE'],
             'KeySchema': [
                 {'AttributeName': 'user_id', 'KeyType': 'HASH'},
                 {'AttributeName': 'password_id', 'KeyType': 'RANGE'}
             ],
             'AttributeDefinitions': [
                 {'AttributeName': 'user_id', 'AttributeType': 'S'},
-                {'AttributeName': 'password_id', 'AttributeType': 'S'}
+                {'AttributeName': 'password_id', 'AttributeType': 'S'},
+                {'AttributeName': 'folder_key', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST',
+            'GlobalSecondaryIndexes': [
+                {
+                    # Sparse: only entries filed in a folder carry folder_key
+                    'IndexName': FOLDER_INDEX,
+                    'KeySchema': [
+                        {'AttributeName': 'folder_key', 'KeyType': 'HASH'},
+                        {'AttributeName': 'password_id', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {
+                        'ProjectionType': 'INCLUDE',
+                        'NonKeyAttributes': ['website', 'username', 'created_at', 'folder', 'tags']
+                    }
+                }
+            ]
+        },
+        {
+            'TableName': config['DYNAMODB_AUDIT_TABLE'],
+            'KeySchema': [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'event_id', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'event_id', 'AttributeType': 'S'}
             ],
             'BillingMode': 'PAY_PER_REQUEST'
         }
     ]
     
+    if config['SESSION_BACKEND'] == 'dynamodb':
+        tables.append({
+            'TableName': config['DYNAMODB_SESSIONS_TABLE'],
+            'KeySchema': [
+                {'AttributeName': 'session_id', 'KeyType': 'HASH'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'session_id', 'AttributeType': 'S'}
+            ],
+            'BillingMode': 'PAY_PER_REQUEST'
+        })
+    
     for table_def in tables:
         try:
             dynamodb_client.create_table(**table_def)
             print(f"Created table: {table_def['TableName']}")
+            if table_def['TableName'] in (config['DYNAMODB_SESSIONS_TABLE'], config['DYNAMODB_AUDIT_TABLE']):
+                dynamodb_client.get_waiter('table_exists').wait(TableName=table_def['TableName'])
+                dynamodb_client.update_time_to_live(
+                    TableName=table_def['TableName'],
+                    TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+                )
         except ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'ResourceInUseException':
                 print(f" Table {table_def['TableName']} already exists")
+                add_missing_indexes(dynamodb_client, table_def)
             elif error_code == 'UnrecognizedClientException' and is_ci_cd_mode():
                 if not hasattr(init_dynamodb_tables, '_ci_warned'):
                     print(f" Skipping DynamoDB table creation in CI/CD mode (test credentials - expected for security scanning)")
@@ -190,34 +317,210 @@ def init_dynamodb_tables():
                     print(f" Error creating table {table_def['TableName']}: {e}")
 
 
+def add_missing_indexes(dynamodb_client, table_def):
+    # Tables created before an index was added to table_def get it here; DynamoDB backfills it
+    wanted = table_def.get('GlobalSecondaryIndexes', [])
+    if not wanted:
+        return
+    try:
+        existing = dynamodb_client.describe_table(TableName=table_def['TableName'])['Table']
+        present = {index['IndexName'] for index in existing.get('GlobalSecondaryIndexes', [])}
+        for index in wanted:
+            if index['IndexName'] in present:
+                continue
+            # One index per UpdateTable call
+            dynamodb_client.update_table(
+                TableName=table_def['TableName'],
+                AttributeDefinitions=table_def['AttributeDefinitions'],
+                GlobalSecondaryIndexUpdates=[{'Create': index}]
+            )
+            print(f"Creating index {index['IndexName']} on {table_def['TableName']}")
+            return
+    except ClientError as e:
+        print(f" Error adding indexes to {table_def['TableName']}: {e}")
+
+
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    with span('bcrypt.hash'):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 
 def check_password(hashed_password, password):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    with span('bcrypt.check'):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
 def get_encryption_key(user_id, password):
-    key_material = f"{user_id}:{password}".encode('utf-8')
-    key = base64.urlsafe_b64encode(hashlib.sha256(key_material).digest())
+    with span('kdf'):
+        key_material = f"{user_id}:{password}".encode('utf-8')
+        key = base64.urlsafe_b64encode(hashlib.sha256(key_material).digest())
     return key
 
 
-def encrypt_password(password_text, encryption_key):
-    f = Fernet(encryption_key)
-    return f.encrypt(password_text.encode('utf-8')).decode('utf-8')
+def encrypt_password(password_text, encryption_key, user_id, password_id):
+    # AES-GCM bound to this entry, stored as binary (see entry_cipher.py)
+    return entry_cipher.encrypt(password_text, encryption_key, user_id, password_id)
 
 
-def decrypt_password(encrypted_password, encryption_key):
+def decrypt_password(encrypted_password, encryption_key, user_id, password_id):
+    # Dispatches on the stored format, so old Fernet strings still decrypt
     try:
-        f = Fernet(encryption_key)
-        return f.decrypt(encrypted_password.encode('utf-8')).decode('utf-8')
-    except Exception as e:
-        error_msg = str(e)
-        if 'did not match' in error_msg or 'InvalidToken' in error_msg:
-            raise ValueError("Unable to decrypt password. This may happen if your login password was changed or encryption key is invalid.")
-        raise
+        return entry_cipher.decrypt(encrypted_password, encryption_key, user_id, password_id)
+    except ValueError:
+        raise ValueError("Unable to decrypt password. This may happen if your login password was changed or encryption key is invalid.")
+
+
+def upgrade_ciphertext(user_id, password_id, stored, password_text, encryption_key):
+    # Lazy migration: rewrite an old-format value after it was read, unless the entry changed meanwhile
+    if not entry_cipher.needs_upgrade(stored):
+        return
+    try:
+        passwords_table.update_item(
+            Key={'user_id': user_id, 'password_id': password_id},
+            UpdateExpression='SET encrypted_password = :new',
+            ConditionExpression='encrypted_password = :old',
+            ExpressionAttributeValues={
+                ':new': encrypt_password(password_text, encryption_key, user_id, password_id),
+                ':old': stored
+            }
+        )
+    except CircuitOpenError:
+        pass  # retried on a later read
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"WARNING: could not upgrade ciphertext for {password_id}: {e}", file=__import__('sys').stderr)
+
+
+def packed_vault(user_id, encryption_key):
+    # None when the per-item layout is in use
+    if current_app.config['VAULT_LAYOUT'] != 'packed':
+        return None
+    return PackedVault(passwords_table, user_id, encryption_key)
+
+
+def is_breached_password(password):
+    path = current_app.config.get('BREACHED_PASSWORDS_FILE')
+    if not path:
+        return False
+    services = current_app.extensions['password_manager']
+    # Opened on first use and kept per app; False once opening has failed
+    if services.breach_index is None:
+        try:
+            services.breach_index = BreachIndex(path)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: breached password check disabled, cannot open {path}: {e}", file=__import__('sys').stderr)
+            services.breach_index = False
+    if not services.breach_index:
+        return False
+    with span('breach_check'):
+        return services.breach_index.is_breached(password)
+
+
+def password_policy_error(password):
+    # Rules for account (login) passwords; returns an error message or None
+    if len(password) < 6:
+        return 'Password must be at least 6 characters'
+    if is_breached_password(password):
+        return 'This password has appeared in a known data breach. Please choose a different one.'
+    return None
+
+
+def is_reserved_id(password_id):
+    # Sort keys starting with '~' are vault pages and health shards, not entries
+    return password_id.startswith('~')
+
+
+def password_health(password_text, encryption_key):
+    # (fingerprint, strength, breached) for the vault health report
+    breached = is_breached_password(password_text)
+    fp = fingerprint(fingerprint_key(encryption_key), password_text)
+    return fp, strength_score(password_text, breached), breached
+
+
+def rebuild_vault_health(user_id, encryption_key):
+    # One-off full pass for vaults created before health tracking
+    vault = packed_vault(user_id, encryption_key)
+    if vault is not None:
+        pages, _ = vault.load()
+        secrets = [(entry['id'], entry['password']) for entry in vault.entries(pages)]
+    else:
+        secrets = []
+        for item in query_all(passwords_table, KeyConditionExpression=Key('user_id').eq(user_id)):
+            if is_reserved_id(item['password_id']) or not item.get('encrypted_password'):
+                continue
+            try:
+                secrets.append((item['password_id'], decrypt_password(item['encrypted_password'], encryption_key,
+                                                                       user_id, item['password_id'])))
+            except ValueError:
+                continue
+    
+    entries = {}
+    for password_id, password_text in secrets:
+        fp, score, _ = password_health(password_text, encryption_key)
+        entries[password_id] = (fp, score)
+    VaultHealth(passwords_table, user_id).rebuild(entries)
+    return entries
+
+
+def password_summary(entry):
+    # Listing fields only; the password and notes are revealed per entry
+    return {
+        'id': entry['id'],
+        'website': entry.get('website', ''),
+        'username': entry.get('username', ''),
+        'folder': entry.get('folder', ''),
+        'tags': list(entry.get('tags', [])),
+        'created_at': entry.get('created_at', '')
+    }
+
+
+def clean_folder(folder):
+    # '' means "not in a folder"; raises ValueError for unusable names
+    if folder is None:
+        return ''
+    if not isinstance(folder, str):
+        raise ValueError('Folder must be a string')
+    folder = folder.strip()
+    if len(folder) > MAX_FOLDER_LENGTH:
+        raise ValueError(f'Folder names are limited to {MAX_FOLDER_LENGTH} characters')
+    return folder
+
+
+def clean_tags(tags):
+    # Trimmed, de-duplicated (case-insensitively) and in the order given
+    if tags is None:
+        return []
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError('Tags must be a list of strings')
+    cleaned = []
+    seen = set()
+    for tag in tags:
+        tag = tag.strip()
+        if not tag or tag.lower() in seen:
+            continue
+        if len(tag) > MAX_TAG_LENGTH:
+            raise ValueError(f'Tags are limited to {MAX_TAG_LENGTH} characters')
+        seen.add(tag.lower())
+        cleaned.append(tag)
+    if len(cleaned) > MAX_TAGS:
+        raise ValueError(f'An entry can have at most {MAX_TAGS} tags')
+    return cleaned
+
+
+def folder_key(user_id, folder):
+    # FolderIndex partition key; user IDs never contain '#', so folder names may
+    return f'{user_id}#{folder}'
+
+
+def query_all(table, **kwargs):
+    # Follow LastEvaluatedKey so partitions over 1 MB are read completely
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
 
 def generate_id():
@@ -241,6 +544,9 @@ def get_totp_uri(username, secret, issuer_name='Password Manager V2'):
 
 def generate_qr_code(uri):
     # """Generate QR code as base64 string"""
+    # Imported here: qrcode (and its PNG writer) is only needed while setting up 2FA
+    import qrcode
+
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
     qr.add_data(uri)
     qr.make(fit=True)
@@ -266,6 +572,68 @@ def is_valid_email(email):
     return re.match(email_regex, email) is not None
 
 
+def start_user_session(user_id, username, data_key):
+    # Fresh session ID on login so a planted ID can't be reused
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
+    session['user_id'] = user_id
+    session['username'] = username
+    session['vault_key'] = data_key.decode('ascii')  # Unwrapped data key, never the password
+    session.pop('user_password', None)
+
+
+def vault_key():
+    # Data key unwrapped at login; sessions from before envelope keys carry the password
+    if 'vault_key' in session:
+        return session['vault_key'].encode('ascii')
+    if 'user_password' in session:
+        return get_encryption_key(session['user_id'], session['user_password'])
+    return None
+
+
+def has_vault_key():
+    return 'vault_key' in session or 'user_password' in session
+
+
+def unlock_vault_key(user, password):
+    # Unwrap the user's data key, setting up the envelope on first login
+    if user.get('wrapped_data_key'):
+        return unwrap_key(user['wrapped_data_key'], password_kek(password, user['kek_salt']))
+    
+    # Existing vaults are encrypted under the password-derived key: adopt it as
+    # the data key so nothing has to be re-encrypted
+    data_key = get_encryption_key(user['user_id'], password)
+    attributes = wrapped_key_attributes(data_key, user['user_id'], password,
+                                        user.get('totp_secret'), current_app.config['RECOVERY_WRAP_SECRET'])
+    try:
+        users_table.update_item(
+            Key={'username': user['username']},
+            UpdateExpression='SET ' + ', '.join(f'{name} = :{name}' for name in attributes),
+            ConditionExpression='attribute_not_exists(wrapped_data_key)',
+            ExpressionAttributeValues={f':{name}': value for name, value in attributes.items()}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # A concurrent login set it up first
+        user = users_table.get_item(Key={'username': user['username']}, ConsistentRead=True)['Item']
+        return unwrap_key(user['wrapped_data_key'], password_kek(password, user['kek_salt']))
+    return data_key
+
+
+def audit(event, user_id, **details):
+    # Queued for the background writer; never adds a DynamoDB call to the request
+    audit_log.record(event, user_id, ip=client_ip(request, current_app.config['TRUSTED_PROXY_COUNT']), **details)
+
+
+def login_retry_after(username):
+    # Returns seconds to wait if this login attempt is over the limit, else 0
+    allowed, retry_after = login_ip_limiter.hit(client_ip(request, current_app.config['TRUSTED_PROXY_COUNT']))
+    if allowed and username:
+        allowed, retry_after = login_user_limiter.hit(username)
+    return 0 if allowed else max(1, int(retry_after + 0.999))
+
+
 def email_exists(email_lower):
     # """Check if email is already registered"""
     if not email_lower:
@@ -287,14 +655,14 @@ def email_exists(email_lower):
 
 
 # Routes
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -311,8 +679,9 @@ def register():
         if password != confirm_password:
             return render_template('register.html', error='Passwords do not match', username=username, email=email)
         
-        if len(password) < 6:
-            return render_template('register.html', error='Password must be at least 6 characters', username=username, email=email)
+        policy_error = password_policy_error(password)
+        if policy_error:
+            return render_template('register.html', error=policy_error, username=username, email=email)
         
         try:
             email_lower = email.lower()
@@ -332,17 +701,17 @@ def register():
             session['reg_password'] = password
             session['reg_totp_secret'] = totp_secret
             
-            return redirect(url_for('setup_totp'))
+            return redirect(url_for('main.setup_totp'))
         except ClientError as e:
             return render_template('register.html', error=f'Database error: {str(e)}')
     
     return render_template('register.html')
 
 
-@app.route('/setup-totp', methods=['GET', 'POST'])
+@bp.route('/setup-totp', methods=['GET', 'POST'])
 def setup_totp():
     if 'reg_username' not in session or 'reg_totp_secret' not in session:
-        return redirect(url_for('register'))
+        return redirect(url_for('main.register'))
     
     username = session['reg_username']
     totp_secret = session['reg_totp_secret']
@@ -363,7 +732,7 @@ def setup_totp():
                                  totp_secret=totp_secret,
                                  error='Invalid TOTP code. Please try again.')
         
-        return redirect(url_for('complete_registration'))
+        return redirect(url_for('main.complete_registration'))
     
     totp_uri = get_totp_uri(username, totp_secret)
     qr_code = generate_qr_code(totp_uri)
@@ -374,10 +743,10 @@ def setup_totp():
                          qr_code=qr_code)
 
 
-@app.route('/complete-registration', methods=['GET'])
+@bp.route('/complete-registration', methods=['GET'])
 def complete_registration():
     if 'reg_username' not in session or 'reg_password' not in session or 'reg_email' not in session:
-        return redirect(url_for('register'))
+        return redirect(url_for('main.register'))
     
     username = session['reg_username']
     email = session['reg_email']
@@ -387,6 +756,7 @@ def complete_registration():
     
     try:
         user_id = generate_id()
+        data_key = generate_data_key()
         users_table.put_item(Item={
             'username': username,
             'user_id': user_id,
@@ -395,7 +765,8 @@ def complete_registration():
             'password_hash': hash_password(password),
             'totp_secret': totp_secret,
             'totp_enabled': True,
-            'created_at': datetime.utcnow().isoformat()
+            'created_at': datetime.utcnow().isoformat(),
+            **wrapped_key_attributes(data_key, user_id, password, totp_secret, current_app.config['RECOVERY_WRAP_SECRET'])
         })
         
         session.pop('reg_username', None)
@@ -404,16 +775,15 @@ def complete_registration():
         session.pop('reg_email_lower', None)
         session.pop('reg_totp_secret', None)
         
-        session['user_id'] = user_id
-        session['username'] = username
-        session['user_password'] = password  # Store temporarily for encryption key
+        start_user_session(user_id, username, data_key)
+        audit('register', user_id)
         
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     except ClientError as e:
         return render_template('register.html', error=f'Database error: {str(e)}')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -422,6 +792,15 @@ def login():
         stored_username = session.get('login_username')
         stored_password = session.get('pending_password')
         
+        # Throttle before any DynamoDB read or bcrypt work
+        retry_after = login_retry_after(username)
+        if retry_after:
+            response = make_response(render_template('login.html', 
+                                                     error='Too many login attempts. Please wait and try again.',
+                                                     username=username), 429)
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        
         if (not password or password.strip() == '') and stored_username and stored_password and stored_username == username:
             password = stored_password
         
@@ -447,6 +826,8 @@ def login():
             if not check_password(user['password_hash'], password):
                 session.pop('login_username', None)
                 session.pop('pending_password', None)
+                if 'user_id' in user:
+                    audit('login_failed', user['user_id'])
                 return render_template('login.html', error='Invalid username or password')
             
             if user.get('totp_enabled', False):
@@ -466,6 +847,7 @@ def login():
                 
                 totp_secret = user.get('totp_secret')
                 if not totp_secret or not verify_totp(totp_secret, totp_token):
+                    audit('totp_failed', user.get('user_id', username), stage='login')
                     return render_template('login.html', 
                                          username=username, 
                                          totp_required=True,
@@ -480,11 +862,16 @@ def login():
                 traceback.print_exc()
                 return render_template('login.html', error='Account data error. Please contact support.')
             
-            session['user_id'] = user['user_id']
-            session['username'] = user.get('username', username)
-            session['user_password'] = password  # Store temporarily for encryption key
+            try:
+                data_key = unlock_vault_key(user, password)
+            except ValueError:
+                print(f"ERROR: User {username} vault key could not be unwrapped", file=__import__('sys').stderr)
+                return render_template('login.html', error='Account data error. Please contact support.')
+            
+            start_user_session(user['user_id'], user.get('username', username), data_key)
+            audit('login', user['user_id'])
             
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         except ClientError as e:
             import traceback
             error_code = e.response.get('Error', {}).get('Code', '')
@@ -504,6 +891,8 @@ def login():
                 return render_template('login.html', error='Service temporarily unavailable. Please try again later.')
             else:
                 return render_template('login.html', error='Database error. Please try again later.')
+        except CircuitOpenError:
+            raise
         except Exception as e:
             import traceback
             print(f"Unexpected error during login: {str(e)}", file=__import__('sys').stderr)
@@ -513,7 +902,7 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/forgot-password', methods=['GET', 'POST'])
+@bp.route('/forgot-password', methods=['GET', 'POST'])
 def forgot_password():
     if request.method == 'POST':
         username_or_email = request.form.get('username_or_email', '').strip()
@@ -554,7 +943,7 @@ def forgot_password():
             session['reset_username'] = user['username']
             session['reset_user_id'] = user['user_id']
             
-            return redirect(url_for('reset_password_verify'))
+            return redirect(url_for('main.reset_password_verify'))
             
         except ClientError:
             return render_template('forgot_password.html', error='An error occurred. Please try again.')
@@ -562,10 +951,10 @@ def forgot_password():
     return render_template('forgot_password.html')
 
 
-@app.route('/reset-password-verify', methods=['GET', 'POST'])
+@bp.route('/reset-password-verify', methods=['GET', 'POST'])
 def reset_password_verify():
     if 'reset_username' not in session:
-        return redirect(url_for('forgot_password'))
+        return redirect(url_for('main.forgot_password'))
     
     username = session['reset_username']
     
@@ -582,18 +971,19 @@ def reset_password_verify():
             if 'Item' not in response:
                 session.pop('reset_username', None)
                 session.pop('reset_user_id', None)
-                return redirect(url_for('forgot_password'))
+                return redirect(url_for('main.forgot_password'))
             
             user = response['Item']
             
             totp_secret = user.get('totp_secret')
             if not totp_secret or not verify_totp(totp_secret, totp_token):
+                audit('totp_failed', user.get('user_id', username), stage='reset')
                 return render_template('reset_password_verify.html', 
                                      username=username,
                                      error='Invalid TOTP code. Please try again.')
             
             session['reset_verified'] = True
-            return redirect(url_for('reset_password'))
+            return redirect(url_for('main.reset_password'))
             
         except ClientError:
             return render_template('reset_password_verify.html', 
@@ -603,10 +993,10 @@ def reset_password_verify():
     return render_template('reset_password_verify.html', username=username)
 
 
-@app.route('/reset-password', methods=['GET', 'POST'])
+@bp.route('/reset-password', methods=['GET', 'POST'])
 def reset_password():
     if 'reset_username' not in session or 'reset_verified' not in session:
-        return redirect(url_for('forgot_password'))
+        return redirect(url_for('main.forgot_password'))
     
     username = session['reset_username']
     user_id = session.get('reset_user_id')
@@ -625,28 +1015,49 @@ def reset_password():
                                  username=username,
                                  error='Passwords do not match')
         
-        if len(password) < 6:
+        policy_error = password_policy_error(password)
+        if policy_error:
             return render_template('reset_password.html', 
                                  username=username,
-                                 error='Password must be at least 6 characters')
+                                 error=policy_error)
         
         try:
+            update_parts = ['password_hash = :ph', 'updated_at = :upd']
+            expression_attribute_values = {
+                ':ph': hash_password(password),
+                ':upd': datetime.utcnow().isoformat()
+            }
+            
+            # Rewrap the vault data key for the new password (TOTP was verified
+            # in reset_password_verify); the vault itself is untouched
+            user = users_table.get_item(Key={'username': username}).get('Item', {})
+            if user.get('recovery_wrapped_data_key') and user.get('totp_secret'):
+                try:
+                    data_key = unwrap_key(user['recovery_wrapped_data_key'],
+                                          recovery_kek(current_app.config['RECOVERY_WRAP_SECRET'], user['user_id'], user['totp_secret']))
+                except ValueError:
+                    print(f"CRITICAL: recovery wrap for user {user['user_id']} could not be unwrapped. "
+                          "Was RECOVERY_WRAP_SECRET (or SECRET_KEY, if it is unset) changed?", file=__import__('sys').stderr)
+                    raise
+                salt = new_salt()
+                update_parts += ['kek_salt = :salt', 'wrapped_data_key = :wdk']
+                expression_attribute_values[':salt'] = salt
+                expression_attribute_values[':wdk'] = wrap_key(data_key, password_kek(password, salt))
+            
             users_table.update_item(
                 Key={'username': username},
-                UpdateExpression='SET password_hash = :ph, updated_at = :upd',
-                ExpressionAttributeValues={
-                    ':ph': hash_password(password),
-                    ':upd': datetime.utcnow().isoformat()
-                }
+                UpdateExpression='SET ' + ', '.join(update_parts),
+                ExpressionAttributeValues=expression_attribute_values
             )
             
             session.pop('reset_username', None)
             session.pop('reset_user_id', None)
             session.pop('reset_verified', None)
+            audit('password_reset', user.get('user_id', user_id))
             
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
             
-        except ClientError:
+        except (ClientError, ValueError):
             return render_template('reset_password.html', 
                                  username=username,
                                  error='Failed to reset password. Please try again.')
@@ -654,12 +1065,15 @@ def reset_password():
     return render_template('reset_password.html', username=username)
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
+    if 'user_id' in session:
+        audit('logout', session['user_id'])
+    
     # Clear all session data
     session.clear()
     
-    response = redirect(url_for('index'))
+    response = redirect(url_for('main.index'))
     
     response = add_no_cache_headers(response)
     
@@ -668,10 +1082,10 @@ def logout():
     return response
 
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if 'user_id' not in session or 'username' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     response = make_response(render_template('dashboard.html', username=session.get('username')))
     
@@ -680,15 +1094,75 @@ def dashboard():
     return response
 
 
-@app.route('/api/passwords', methods=['GET'])
+def list_vault(user_id, encryption_key, folder=''):
+    # Listing entries for the vault (or one folder), or None if it exists but can't be decrypted
+    vault = packed_vault(user_id, encryption_key)
+    if vault is not None:
+        items = query_all(passwords_table, KeyConditionExpression=Key('user_id').eq(user_id))
+        pages, legacy = vault.load(items)
+        if legacy:
+            # Lazy migration of per-item entries into pages
+            vault.migrate(legacy, lambda item: decrypt_password(item['encrypted_password'], encryption_key,
+                                                                user_id, item['password_id']))
+            pages, legacy = vault.load()
+        entries = vault.entries(pages)
+        # Health shards aren't vault data: only pages and entry items that yield nothing mean a wrong key
+        stored = [item for item in items
+                  if not is_reserved_id(item['password_id']) or item['password_id'].startswith(PAGE_PREFIX)]
+        if stored and not entries:
+            return None
+        if folder:
+            # Pages are encrypted as a whole, so folders are filtered after decrypting
+            entries = [entry for entry in entries if entry.get('folder', '') == folder]
+    else:
+        # Skip encrypted_password and notes; secrets are fetched one at a time
+        listing = {
+            'ProjectionExpression': 'password_id, #website, #username, #folder, #tags, created_at',
+            'ExpressionAttributeNames': {'#website': 'website', '#username': 'username',
+                                         '#folder': 'folder', '#tags': 'tags'}
+        }
+        items = None
+        if folder:
+            try:
+                items = query_all(passwords_table, IndexName=FOLDER_INDEX,
+                                  KeyConditionExpression=Key('folder_key').eq(folder_key(user_id, folder)),
+                                  **listing)
+            except ClientError as e:
+                # Index still being created on an existing table: filter the full listing instead
+                if e.response['Error']['Code'] != 'ValidationException':
+                    raise
+        if items is None:
+            # Entries always have a ciphertext; anything else in the partition is not an entry
+            items = query_all(passwords_table, KeyConditionExpression=Key('user_id').eq(user_id),
+                              FilterExpression=Attr('encrypted_password').exists(), **listing)
+            if folder:
+                items = [item for item in items if item.get('folder', '') == folder]
+        entries = [{**item, 'id': item['password_id']} for item in items if not is_reserved_id(item['password_id'])]
+    return [password_summary(entry) for entry in entries]
+
+
+@bp.route('/api/session', methods=['GET'])
+def get_session():
+    """Cheap authentication check for the dashboard; no DynamoDB access"""
+    if 'user_id' not in session or not has_vault_key():
+        response = make_response(jsonify({'authenticated': False}), 401)
+        response = add_no_cache_headers(response)
+        return response
+    
+    response = make_response(jsonify({'authenticated': True, 'username': session.get('username')}))
+    response = add_no_cache_headers(response)
+    return response
+
+
+@bp.route('/api/passwords', methods=['GET'])
 def get_passwords():
-    """Get all passwords for the current user"""
+    """List the current user's passwords (metadata only, no secrets)"""
     if 'user_id' not in session:
         response = make_response(jsonify({'error': 'Not authenticated. Please log in again.'}), 401)
         response = add_no_cache_headers(response)
         return response
     
-    if 'user_password' not in session:
+    if not has_vault_key():
         response = make_response(jsonify({'error': 'Session expired. Please log in again.'}), 401)
         response = add_no_cache_headers(response)
         return response
@@ -696,53 +1170,28 @@ def get_passwords():
     user_id = session['user_id']
     
     try:
-        encryption_key = get_encryption_key(user_id, session['user_password'])
+        folder = clean_folder(request.args.get('folder'))
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 400)
+        response = add_no_cache_headers(response)
+        return response
+    
+    try:
+        encryption_key = vault_key()
     except Exception as e:
         response = make_response(jsonify({'error': f'Error generating encryption key: {str(e)}'}), 500)
         response = add_no_cache_headers(response)
         return response
     
     try:
-        result = []
-        response = passwords_table.query(
-            KeyConditionExpression=Key('user_id').eq(user_id)
-        )
-        
-        items = response.get('Items', [])
-        if not items:
-            response_obj = make_response(jsonify({'passwords': []}))
-            response_obj = add_no_cache_headers(response_obj)
-            return response_obj
-        
-        decryption_errors = []
-        for item in items:
-            try:
-                encrypted_pwd = item.get('encrypted_password')
-                if not encrypted_pwd:
-                    continue  # Skip items without encrypted_password
-                
-                decrypted_password = decrypt_password(encrypted_pwd, encryption_key)
-                result.append({
-                    'id': item['password_id'],
-                    'website': item.get('website', ''),
-                    'username': item.get('username', ''),
-                    'password': decrypted_password,
-                    'notes': item.get('notes', ''),
-                    'created_at': item.get('created_at', '')
-                })
-            except ValueError as e:
-                # Password can't be decrypted - likely wrong encryption key
-                decryption_errors.append(item.get('password_id', 'unknown'))
-                continue
-            except Exception as e:
-                # Other decryption errors
-                error_msg = str(e)
-                if 'did not match' in error_msg or 'InvalidToken' in error_msg:
-                    decryption_errors.append(item.get('password_id', 'unknown'))
-                continue
-        
-        
-        if items and not result:
+        if folder:
+            # Folder listings are small and keyed differently, so they skip coalescing
+            # (vault_reads.forget only knows the whole-vault key)
+            result = list_vault(user_id, encryption_key, folder)
+        else:
+            # Concurrent listings for this user share one query/decrypt
+            result = vault_reads.do(user_id, lambda: list_vault(user_id, encryption_key))
+        if result is None:
             response = make_response(jsonify({
                 'error': 'Unable to decrypt passwords. This may happen if your login password was changed. Please contact support.',
                 'passwords': []
@@ -750,23 +1199,78 @@ def get_passwords():
             response = add_no_cache_headers(response)
             return response
         
-        response = make_response(jsonify({'passwords': result}))
+        with span('serialize'):
+            response = make_response(jsonify({'passwords': result}))
         response = add_no_cache_headers(response)
         return response
     except ClientError as e:
         response = make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
         response = add_no_cache_headers(response)
         return response
+    except CircuitOpenError:
+        raise
     except Exception as e:
         response = make_response(jsonify({'error': f'Unexpected error: {str(e)}'}), 500)
         response = add_no_cache_headers(response)
         return response
 
 
-@app.route('/api/passwords', methods=['POST'])
+@bp.route('/api/passwords/<password_id>/secret', methods=['GET'])
+def get_password_secret(password_id):
+    """Decrypt and return a single password and its notes"""
+    if 'user_id' not in session or not has_vault_key():
+        response = make_response(jsonify({'error': 'Not authenticated. Please log in again.'}), 401)
+        response = add_no_cache_headers(response)
+        return response
+    
+    if is_reserved_id(password_id):
+        response = make_response(jsonify({'error': 'Password not found'}), 404)
+        response = add_no_cache_headers(response)
+        return response
+    
+    user_id = session['user_id']
+    encryption_key = vault_key()
+    
+    try:
+        vault = packed_vault(user_id, encryption_key)
+        entry = vault.get_entry(password_id) if vault is not None else None
+        
+        if entry is None:
+            item = passwords_table.get_item(
+                Key={'user_id': user_id, 'password_id': password_id},
+                ProjectionExpression='encrypted_password, notes'
+            ).get('Item')
+            if not item or not item.get('encrypted_password'):
+                response = make_response(jsonify({'error': 'Password not found'}), 404)
+                response = add_no_cache_headers(response)
+                return response
+            entry = {
+                'password': decrypt_password(item['encrypted_password'], encryption_key, user_id, password_id),
+                'notes': item.get('notes', '')
+            }
+            upgrade_ciphertext(user_id, password_id, item['encrypted_password'], entry['password'], encryption_key)
+        
+        response = make_response(jsonify({
+            'id': password_id,
+            'password': entry['password'],
+            'notes': entry.get('notes', '')
+        }))
+        response = add_no_cache_headers(response)
+        return response
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 500)
+        response = add_no_cache_headers(response)
+        return response
+    except ClientError as e:
+        response = make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+        response = add_no_cache_headers(response)
+        return response
+
+
+@bp.route('/api/passwords', methods=['POST'])
 def add_password():
     """Add a new password"""
-    if 'user_id' not in session or 'user_password' not in session:
+    if 'user_id' not in session or not has_vault_key():
         response = make_response(jsonify({'error': 'Not authenticated'}), 401)
         response = add_no_cache_headers(response)
         return response
@@ -782,113 +1286,335 @@ def add_password():
         response = add_no_cache_headers(response)
         return response
     
+    try:
+        folder = clean_folder(data.get('folder'))
+        tags = clean_tags(data.get('tags'))
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 400)
+        response = add_no_cache_headers(response)
+        return response
+    
     user_id = session['user_id']
-    encryption_key = get_encryption_key(user_id, session['user_password'])
+    encryption_key = vault_key()
     
     try:
-        encrypted_password = encrypt_password(password, encryption_key)
         password_id = generate_id()
+        created_at = datetime.utcnow().isoformat()
+        fp, strength, breached = password_health(password, encryption_key)
         
-        passwords_table.put_item(Item={
-            'user_id': user_id,
-            'password_id': password_id,
-            'website': website,
-            'username': username or '',
-            'encrypted_password': encrypted_password,
-            'notes': notes or '',
-            'created_at': datetime.utcnow().isoformat()
-        })
+        vault = packed_vault(user_id, encryption_key)
+        if vault is not None:
+            vault.add([{
+                'id': password_id,
+                'website': website,
+                'username': username or '',
+                'password': password,
+                'notes': notes or '',
+                'folder': folder,
+                'tags': tags,
+                'fingerprint': fp,
+                'strength': strength,
+                'created_at': created_at,
+                'updated_at': created_at
+            }])
+        else:
+            encrypted_password = encrypt_password(password, encryption_key, user_id, password_id)
+            item = {
+                'user_id': user_id,
+                'password_id': password_id,
+                'website': website,
+                'username': username or '',
+                'encrypted_password': encrypted_password,
+                'notes': notes or '',
+                'fingerprint': fp,
+                'strength': strength,
+                'created_at': created_at
+            }
+            if folder:
+                item['folder'] = folder
+                item['folder_key'] = folder_key(user_id, folder)
+            if tags:
+                item['tags'] = tags
+            passwords_table.put_item(Item=item)
         
-        response = make_response(jsonify({'message': 'Password added successfully', 'id': password_id}), 201)
+        VaultHealth(passwords_table, user_id).record(password_id, fp, strength)
+        vault_reads.forget(user_id)
+        audit('vault_add', user_id, password_id=password_id)
+        
+        # The stored entry (listing fields), so the dashboard can patch its list without a reload
+        response = make_response(jsonify({
+            'message': 'Password added successfully',
+            'id': password_id,
+            'password': password_summary({
+                'id': password_id,
+                'website': website,
+                'username': username or '',
+                'folder': folder,
+                'tags': tags,
+                'created_at': created_at
+            }),
+            'breached': breached
+        }), 201)
+        response = add_no_cache_headers(response)
+        return response
+    except PageConflict:
+        response = make_response(jsonify({'error': 'The vault was changed by another request. Please try again.'}), 409)
         response = add_no_cache_headers(response)
         return response
     except ClientError as e:
         response = make_response(jsonify({'error': str(e)}), 500)
         response = add_no_cache_headers(response)
         return response
+    except CircuitOpenError:
+        raise
     except Exception as e:
         response = make_response(jsonify({'error': f'Unexpected error: {str(e)}'}), 500)
         response = add_no_cache_headers(response)
         return response
 
 
-@app.route('/api/passwords/<password_id>', methods=['DELETE'])
+@bp.route('/api/passwords/<password_id>', methods=['DELETE'])
 def delete_password(password_id):
     if 'user_id' not in session:
         response = make_response(jsonify({'error': 'Not authenticated'}), 401)
         response = add_no_cache_headers(response)
         return response
     
+    if is_reserved_id(password_id):
+        response = make_response(jsonify({'error': 'Password not found'}), 404)
+        response = add_no_cache_headers(response)
+        return response
+    
     user_id = session['user_id']
     
     try:
-        passwords_table.delete_item(
-            Key={
-                'user_id': user_id,
-                'password_id': password_id
-            }
-        )
+        vault = None
+        if has_vault_key():
+            vault = packed_vault(user_id, vault_key())
+        if vault is None or not vault.delete(password_id):
+            passwords_table.delete_item(
+                Key={
+                    'user_id': user_id,
+                    'password_id': password_id
+                }
+            )
+        
+        VaultHealth(passwords_table, user_id).forget(password_id)
+        vault_reads.forget(user_id)
+        audit('vault_delete', user_id, password_id=password_id)
+        
         response = make_response(jsonify({'message': 'Password deleted successfully'}))
         response = add_no_cache_headers(response)
         return response
+    except PageConflict:
+        response = make_response(jsonify({'error': 'The vault was changed by another request. Please try again.'}), 409)
+        response = add_no_cache_headers(response)
+        return response
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 500)
+        response = add_no_cache_headers(response)
+        return response
     except ClientError as e:
         response = make_response(jsonify({'error': str(e)}), 500)
         response = add_no_cache_headers(response)
         return response
 
 
-@app.route('/api/passwords/<password_id>', methods=['PUT'])
+@bp.route('/api/passwords/<password_id>', methods=['PUT'])
 def update_password(password_id):
-    if 'user_id' not in session or 'user_password' not in session:
+    if 'user_id' not in session or not has_vault_key():
         response = make_response(jsonify({'error': 'Not authenticated'}), 401)
         response = add_no_cache_headers(response)
         return response
     
+    if is_reserved_id(password_id):
+        response = make_response(jsonify({'error': 'Password not found'}), 404)
+        response = add_no_cache_headers(response)
+        return response
+    
     data = request.get_json()
+    
+    try:
+        if 'tags' in data:
+            data['tags'] = clean_tags(data['tags'])
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 400)
+        response = add_no_cache_headers(response)
+        return response
+    
     user_id = session['user_id']
-    encryption_key = get_encryption_key(user_id, session['user_password'])
+    encryption_key = vault_key()
     
     try:
-        update_parts = []
-        expression_attribute_values = {}
-        
-        if data.get('website'):
-            update_parts.append('website = :website')
-            expression_attribute_values[':website'] = data['website']
+        updated_at = datetime.utcnow().isoformat()
+        health = password_health(data['password'], encryption_key) if data.get('password') else None
         
-        if 'username' in data:
-            update_parts.append('username = :username')
-            expression_attribute_values[':username'] = data['username']
+        vault = packed_vault(user_id, encryption_key)
+        updated = None
+        if vault is not None:
+            changes = {'updated_at': updated_at}
+            for field in ('website', 'password'):
+                if data.get(field):
+                    changes[field] = data[field]
+            for field in ('username', 'notes', 'tags'):
+                if field in data:
+                    changes[field] = data[field]
+            if health:
+                changes['fingerprint'], changes['strength'] = health[0], health[1]
+            updated = vault.update(password_id, changes)
         
-        if data.get('password'):
-            encrypted_password = encrypt_password(data['password'], encryption_key)
-            update_parts.append('encrypted_password = :encrypted_password')
-            expression_attribute_values[':encrypted_password'] = encrypted_password
-        
-        if 'notes' in data:
-            update_parts.append('notes = :notes')
-            expression_attribute_values[':notes'] = data['notes']
+        # Per-item layout, or an entry that hasn't been moved into a page yet
+        if updated is None:
+            update_parts = []
+            expression_attribute_values = {}
+            
+            if data.get('website'):
+                update_parts.append('website = :website')
+                expression_attribute_values[':website'] = data['website']
+            
+            if 'username' in data:
+                update_parts.append('username = :username')
+                expression_attribute_values[':username'] = data['username']
+            
+            if data.get('password'):
+                encrypted_password = encrypt_password(data['password'], encryption_key, user_id, password_id)
+                update_parts.append('encrypted_password = :encrypted_password')
+                expression_attribute_values[':encrypted_password'] = encrypted_password
+                update_parts.append('fingerprint = :fingerprint')
+                expression_attribute_values[':fingerprint'] = health[0]
+                update_parts.append('strength = :strength')
+                expression_attribute_values[':strength'] = health[1]
+            
+            if 'notes' in data:
+                update_parts.append('notes = :notes')
+                expression_attribute_values[':notes'] = data['notes']
+            
+            if 'tags' in data:
+                update_parts.append('tags = :tags')
+                expression_attribute_values[':tags'] = data['tags']
+            
+            update_parts.append('updated_at = :updated_at')
+            expression_attribute_values[':updated_at'] = updated_at
+            
+            update_expression = 'SET ' + ', '.join(update_parts)
+            
+            try:
+                attributes = passwords_table.update_item(
+                    Key={
+                        'user_id': user_id,
+                        'password_id': password_id
+                    },
+                    UpdateExpression=update_expression,
+                    # Update only; never create a stub item for an unknown ID
+                    ConditionExpression='attribute_exists(password_id)',
+                    ExpressionAttributeValues=expression_attribute_values,
+                    ReturnValues='ALL_NEW'
+                )['Attributes']
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                response = make_response(jsonify({'error': 'Password not found'}), 404)
+                response = add_no_cache_headers(response)
+                return response
+            updated = {**attributes, 'id': password_id}
         
-        update_parts.append('updated_at = :updated_at')
-        expression_attribute_values[':updated_at'] = datetime.utcnow().isoformat()
+        if health:
+            VaultHealth(passwords_table, user_id).record(password_id, health[0], health[1])
+        vault_reads.forget(user_id)
+        audit('vault_update', user_id, password_id=password_id, password_changed=bool(health))
         
-        if not update_parts:
-            response = make_response(jsonify({'error': 'No fields to update'}), 400)
-            response = add_no_cache_headers(response)
-            return response
+        response = make_response(jsonify({
+            'message': 'Password updated successfully',
+            'password': password_summary(updated),
+            'breached': bool(health and health[2])
+        }))
+        response = add_no_cache_headers(response)
+        return response
+    except PageConflict:
+        response = make_response(jsonify({'error': 'The vault was changed by another request. Please try again.'}), 409)
+        response = add_no_cache_headers(response)
+        return response
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 500)
+        response = add_no_cache_headers(response)
+        return response
+    except ClientError as e:
+        response = make_response(jsonify({'error': str(e)}), 500)
+        response = add_no_cache_headers(response)
+        return response
+
+
+@bp.route('/api/passwords/<password_id>/folder', methods=['PUT'])
+def move_password(password_id):
+    """Move an entry to another folder ('' for none) with one conditional write"""
+    if 'user_id' not in session or not has_vault_key():
+        response = make_response(jsonify({'error': 'Not authenticated'}), 401)
+        response = add_no_cache_headers(response)
+        return response
+    
+    if is_reserved_id(password_id):
+        response = make_response(jsonify({'error': 'Password not found'}), 404)
+        response = add_no_cache_headers(response)
+        return response
+    
+    try:
+        folder = clean_folder((request.get_json() or {}).get('folder'))
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 400)
+        response = add_no_cache_headers(response)
+        return response
+    
+    user_id = session['user_id']
+    
+    try:
+        updated_at = datetime.utcnow().isoformat()
+        vault = packed_vault(user_id, vault_key())
+        updated = None
+        if vault is not None:
+            # Rewrites the entry's page, guarded by page_version
+            updated = vault.update(password_id, {'folder': folder, 'updated_at': updated_at})
         
-        update_expression = 'SET ' + ', '.join(update_parts)
+        if updated is None:
+            if folder:
+                update_expression = 'SET #folder = :folder, folder_key = :folder_key, updated_at = :updated_at'
+                expression_attribute_values = {':folder': folder, ':folder_key': folder_key(user_id, folder),
+                                               ':updated_at': updated_at}
+            else:
+                # Dropping folder_key takes the entry out of the sparse index
+                update_expression = 'SET updated_at = :updated_at REMOVE #folder, folder_key'
+                expression_attribute_values = {':updated_at': updated_at}
+            try:
+                attributes = passwords_table.update_item(
+                    Key={'user_id': user_id, 'password_id': password_id},
+                    UpdateExpression=update_expression,
+                    ConditionExpression='attribute_exists(password_id)',
+                    ExpressionAttributeNames={'#folder': 'folder'},
+                    ExpressionAttributeValues=expression_attribute_values,
+                    ReturnValues='ALL_NEW'
+                )['Attributes']
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                response = make_response(jsonify({'error': 'Password not found'}), 404)
+                response = add_no_cache_headers(response)
+                return response
+            updated = {**attributes, 'id': password_id}
         
-        passwords_table.update_item(
-            Key={
-                'user_id': user_id,
-                'password_id': password_id
-            },
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values
-        )
+        vault_reads.forget(user_id)
+        audit('vault_move', user_id, password_id=password_id)
         
-        response = make_response(jsonify({'message': 'Password updated successfully'}))
+        response = make_response(jsonify({
+            'message': 'Password moved successfully',
+            'password': password_summary(updated)
+        }))
+        response = add_no_cache_headers(response)
+        return response
+    except PageConflict:
+        response = make_response(jsonify({'error': 'The vault was changed by another request. Please try again.'}), 409)
+        response = add_no_cache_headers(response)
+        return response
+    except ValueError as e:
+        response = make_response(jsonify({'error': str(e)}), 500)
         response = add_no_cache_headers(response)
         return response
     except ClientError as e:
@@ -897,15 +1623,194 @@ def update_password(password_id):
         return response
 
 
-@app.route('/health')
+@bp.route('/api/passwords/health', methods=['GET'])
+def get_password_health():
+    """Reused and weak password report, served from stored fingerprints"""
+    if 'user_id' not in session or not has_vault_key():
+        response = make_response(jsonify({'error': 'Not authenticated'}), 401)
+        response = add_no_cache_headers(response)
+        return response
+    
+    user_id = session['user_id']
+    
+    try:
+        entries = VaultHealth(passwords_table, user_id).load()
+        if entries is None:
+            entries = rebuild_vault_health(user_id, vault_key())
+        
+        response = make_response(jsonify(build_report(entries)))
+        response = add_no_cache_headers(response)
+        return response
+    except ClientError as e:
+        response = make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+        response = add_no_cache_headers(response)
+        return response
+
+
+@bp.app_errorhandler(CircuitOpenError)
+def dynamodb_unavailable(error):
+    print(f"Failing fast: {error}", file=__import__('sys').stderr)
+    if request.path.startswith('/api/'):
+        response = make_response(jsonify({'error': 'Service temporarily unavailable. Please try again shortly.'}), 503)
+    else:
+        response = make_response('Service temporarily unavailable. Please try again shortly.', 503)
+    response.headers['Retry-After'] = str(error.retry_after)
+    response = add_no_cache_headers(response)
+    return response
+
+
+@bp.route('/api/audit', methods=['GET'])
+def get_audit_events():
+    """The signed-in user's recent security events, newest first"""
+    if 'user_id' not in session:
+        response = make_response(jsonify({'error': 'Not authenticated'}), 401)
+        response = add_no_cache_headers(response)
+        return response
+    
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    
+    try:
+        events = [{
+            'event': item['event'],
+            'at': item['at'],
+            'ip': item.get('ip'),
+            'details': item.get('details', {})
+        } for item in audit_log.recent(session['user_id'], limit=limit)]
+        response = make_response(jsonify({'events': events}))
+        response = add_no_cache_headers(response)
+        return response
+    except ClientError as e:
+        response = make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+        response = add_no_cache_headers(response)
+        return response
+
+
+@bp.route('/health')
 def health():
+    # Liveness only; dependency checks live in /ready
     return jsonify({'ok': True}), 200
 
 
+@bp.route('/ready')
+def ready():
+    status = readiness_checker.status()
+    response = make_response(jsonify(status), 200 if status['ready'] else 503)
+    response = add_no_cache_headers(response)
+    return response
+
+
+def create_app(config=None, tables=None):
+    """Build a configured app.
+    
+    ``config`` overrides the settings read from the environment, and
+    ``tables`` maps 'users', 'passwords', 'sessions' or 'audit' to stand-in
+    table objects. DynamoDB clients are created on first use, not here.
+    """
+    app = Flask(__name__)
+    app.config.update(config_from_env())
+    app.config.update(config or {})
+    
+    if not app.config.get('SECRET_KEY'):
+        import sys
+        print("ERROR: SECRET_KEY environment variable is not set!", file=sys.stderr)
+        print(f"Available environment variables: {sorted(list(os.environ.keys()))}", file=sys.stderr)
+        print(f"SECRET_KEY value: {repr(os.getenv('SECRET_KEY'))}", file=sys.stderr)
+        print(f"FLASK_ENV: {os.getenv('FLASK_ENV')}", file=sys.stderr)
+        print(f"AWS_REGION: {os.getenv('AWS_REGION')}", file=sys.stderr)
+        raise ValueError("SECRET_KEY is required. Please set it in Elastic Beanstalk environment variables using: eb setenv SECRET_KEY=your-key -e secured-orbit-env")
+    
+    if not app.config.get('RECOVERY_WRAP_SECRET'):
+        # Falling back to SECRET_KEY ties every recovery wrap to the session-signing key:
+        # rotating SECRET_KEY would silently break password reset for all users
+        if os.getenv('FLASK_ENV') == 'production':
+            raise ValueError("RECOVERY_WRAP_SECRET is required in production. Existing deployments must set it to "
+                             "the current SECRET_KEY value (recovery wraps were made with it) and never rotate it.")
+        print("WARNING: RECOVERY_WRAP_SECRET is not set; using SECRET_KEY for recovery wraps. "
+              "Rotating SECRET_KEY will break password reset.", file=__import__('sys').stderr)
+        app.config['RECOVERY_WRAP_SECRET'] = app.config['SECRET_KEY']
+    
+    csrf.init_app(app)
+    compression.init_app(app)
+    assets.init_app(app)
+    
+    timed = app.config['SERVER_TIMING_ENABLED'] or app.config['SLOW_REQUEST_LOG_MS']
+    dynamodb = DynamoDBResources(app.config, tables=tables,
+                                 on_client_created=server_timing.instrument_boto_client if timed else None)
+    server_timing.init_app(app)
+    profiler = profiling.init_app(app)
+    
+    # Readiness probes bypass the breaker so they keep reporting during an outage
+    readiness = ReadinessChecker(
+        dynamodb.client,
+        tables=(app.config['DYNAMODB_USERS_TABLE'], app.config['DYNAMODB_PASSWORDS_TABLE']),
+        canary_table=dynamodb.raw_table('users'),
+        canary_key={'username': CANARY_KEY},
+        interval=app.config['READINESS_INTERVAL'],
+        max_age=app.config['READINESS_MAX_AGE']
+    )
+    
+    audit = AuditLog(
+        dynamodb.table('audit'),
+        spool_path=app.config['AUDIT_SPOOL_FILE'],
+        retention_days=app.config['AUDIT_RETENTION_DAYS'],
+        max_queue=app.config['AUDIT_QUEUE_SIZE'],
+        max_spool_bytes=app.config['AUDIT_SPOOL_MAX_BYTES']
+    )
+    atexit.register(audit.close)
+    
+    # Swap the store for a shared BucketStore when running more than one instance
+    rate_limit_store = MemoryBucketStore()
+    
+    if app.config['SESSION_BACKEND'] == 'memory':
+        store = MemorySessionStore(max_entries=app.config['SESSION_MAX_ENTRIES'])
+    elif app.config['SESSION_BACKEND'] == 'dynamodb':
+        store = DynamoDBSessionStore(dynamodb.table('sessions'))
+    else:
+        store = None
+    
+    if store is not None:
+        app.session_interface = ServerSideSessionInterface(store, ttl=app.config['SESSION_TTL_SECONDS'])
+    
+    app.extensions['password_manager'] = SimpleNamespace(
+        dynamodb=dynamodb,
+        users_table=dynamodb.table('users'),
+        passwords_table=dynamodb.table('passwords'),
+        readiness_checker=readiness,
+        audit_log=audit,
+        # Coalesces concurrent vault listings per user (see single_flight.py)
+        vault_reads=SingleFlight(),
+        login_ip_limiter=TokenBucketLimiter(rate_limit_store, app.config['LOGIN_RATE_LIMIT_IP'], 'login-ip'),
+        login_user_limiter=TokenBucketLimiter(rate_limit_store, app.config['LOGIN_RATE_LIMIT_USER'], 'login-user'),
+        session_store=store,
+        # Opened lazily by is_breached_password
+        breach_index=None,
+        # None unless profiling is enabled
+        profiler=profiler
+    )
+    
+    app.register_blueprint(bp)
+    return app
+
+
+_default_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # `app` (gunicorn's app:app, application.py) is built from the environment on first access
+    if name == 'app':
+        with _default_app_lock:
+            if 'app' not in globals():
+                globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == '__main__':
+    app = create_app()
+    
     # Initialize DynamoDB tables for local development (non-blocking)
     try:
-        init_dynamodb_tables()
+        init_dynamodb_tables(app)
     except Exception as e:
         print(f"⚠️  Warning: DynamoDB initialization failed (non-critical): {e}")
         print("ℹ️  Application will continue to run, but database features may not work.")
@@ -0,0 +1,72 @@
+"""
+Content-hashed static asset URLs.
+
+At startup every file under ``static/`` is hashed and given a fingerprinted
+name (``css/style.css`` -> ``css/style.1a2b3c4d5e6f.css``). Templates use
+``asset_url_for('static', filename=...)`` in place of ``url_for`` and the
+fingerprinted URLs are served with a one year immutable cache lifetime, so
+a changed file always gets a new URL.
+"""
+import hashlib
+import os
+
+from flask import current_app, send_from_directory, url_for
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def fingerprint_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{digest}{ext}'
+
+
+def build_manifest(static_folder):
+    manifest = {}
+    for dirpath, _, filenames in os.walk(static_folder):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            manifest[filename] = fingerprint_name(filename, digest)
+    return manifest
+
+
+class AssetManifest:
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.reload()
+
+    def reload(self):
+        self.files = build_manifest(self.static_folder) if os.path.isdir(self.static_folder) else {}
+        self.originals = {hashed: filename for filename, hashed in self.files.items()}
+
+
+def asset_url_for(endpoint, **values):
+    """url_for that swaps static filenames for their fingerprinted names"""
+    manifest = current_app.extensions.get('asset_manifest')
+    if endpoint == 'static' and manifest is not None and not current_app.debug:
+        filename = values.get('filename')
+        if filename in manifest.files:
+            values['filename'] = manifest.files[filename]
+    return url_for(endpoint, **values)
+
+
+def init_app(app):
+    manifest = AssetManifest(app.static_folder)
+    app.extensions['asset_manifest'] = manifest
+    app.jinja_env.globals['asset_url_for'] = asset_url_for
+
+    plain_static = app.view_functions['static']
+
+    def static(filename):
+        original = manifest.originals.get(filename)
+        if original is None:
+            return plain_static(filename=filename)
+        response = send_from_directory(app.static_folder, original)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    app.view_functions['static'] = static
+    return manifest
@@ -0,0 +1,168 @@
+"""
+Asynchronous security audit log.
+
+``AuditLog.record`` only builds a small dict and puts it on a bounded
+in-process queue, so auditing adds no DynamoDB round trip to a request. A
+background thread drains the queue into the audit table in batches of up to
+25 items (one ``BatchWriteItem``). Items are keyed by ``user_id`` with a
+time-ordered ``event_id`` sort key and expire through the ``expires_at``
+TTL attribute.
+
+Batches that cannot be written are appended to a local JSON-lines spool file
+(capped at ``max_spool_bytes``; further events are dropped and counted). The
+spool is replayed when the writer thread starts, after every successful
+flush, and every ``SPOOL_RETRY_SECONDS`` while the log is idle. ``close``
+flushes whatever is still queued; the app registers it with ``atexit``.
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from boto3.dynamodb.conditions import Key
+
+
+BATCH_SIZE = 25
+# How often an idle writer retries a non-empty spool
+SPOOL_RETRY_SECONDS = 60
+
+
+class AuditLog:
+    def __init__(self, table, spool_path, retention_days=90, max_queue=10000, flush_interval=1.0,
+                 max_spool_bytes=10 * 1024 * 1024):
+        self.table = table
+        self.spool_path = spool_path
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.max_spool_bytes = max_spool_bytes
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._next_replay = 0.0
+
+    def record(self, event, user_id, ip=None, **details):
+        """Queue one event; never blocks and never raises"""
+        now = datetime.now(timezone.utc)
+        item = {
+            'user_id': user_id,
+            'event_id': f'{now.isoformat()}#{uuid4().hex[:8]}',
+            'event': event,
+            'at': now.isoformat(),
+            'expires_at': int(now.timestamp()) + self.retention_days * 86400
+        }
+        if ip:
+            item['ip'] = ip
+        if details:
+            item['details'] = {name: str(value) for name, value in details.items()}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.start()
+
+    def recent(self, user_id, limit=50):
+        """Newest first; events still in the queue are not visible yet"""
+        response = self.table.query(
+            KeyConditionExpression=Key('user_id').eq(user_id),
+            ScanIndexForward=False,
+            Limit=limit
+        )
+        return response.get('Items', [])
+
+    def start(self):
+        # Started lazily so each gunicorn worker (post-fork) runs its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        while True:
+            batch = self._take(timeout=None)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _loop(self):
+        self._replay_spool()
+        while not self._stop.is_set():
+            batch = self._take(timeout=self.flush_interval)
+            if batch:
+                # A successful write means DynamoDB is reachable again
+                if self._flush(batch):
+                    self._replay_spool()
+            elif time.monotonic() >= self._next_replay:
+                self._replay_spool()
+
+    def _take(self, timeout):
+        # Block for the first event (unless timeout is None), then take what's already queued
+        try:
+            first = self._queue.get(timeout=timeout) if timeout is not None else self._queue.get_nowait()
+        except queue.Empty:
+            return []
+        batch = [first]
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        try:
+            with self.table.batch_writer() as writer:
+                for item in batch:
+                    writer.put_item(Item=item)
+            return True
+        except Exception as e:
+            print(f"Audit flush failed, spooling {len(batch)} events: {e}", file=sys.stderr)
+            self._spool(batch)
+            return False
+
+    def _spool(self, batch):
+        try:
+            with self._spool_lock:
+                size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+                if size >= self.max_spool_bytes:
+                    self.dropped += len(batch)
+                    print(f"Audit spool is full ({size} bytes), dropped {len(batch)} events", file=sys.stderr)
+                    return
+                with open(self.spool_path, 'a', encoding='utf-8') as spool:
+                    for item in batch:
+                        spool.write(json.dumps(item) + '\n')
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"Audit spool write failed, dropped {len(batch)} events: {e}", file=sys.stderr)
+
+    def _replay_spool(self):
+        self._next_replay = time.monotonic() + SPOOL_RETRY_SECONDS
+        replay_path = self.spool_path + '.replay'
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return
+            os.replace(self.spool_path, replay_path)
+        items = []
+        with open(replay_path, encoding='utf-8') as spool:
+            for line in spool:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    continue  # torn write from a crash
+        os.remove(replay_path)
+        for start in range(0, len(items), BATCH_SIZE):
+            self._flush(items[start:start + BATCH_SIZE])
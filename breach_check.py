@@ -0,0 +1,233 @@
+"""
+Offline breached-password check.
+
+Looks passwords up in a local index of SHA-1 or NTLM hash prefixes built
+from a breach dump (e.g. the Pwned Passwords ``HASH:count`` files). The
+index is memory-mapped, so gunicorn workers share the page cache and a
+lookup touches only a few pages:
+
+    header    24 bytes   magic, version, algorithm, record length, count
+    offsets   65537 x u64   first record index for each leading 2-byte bucket
+    records   count x record_len   sorted, de-duplicated hash prefixes
+
+Build an index with:
+
+    python breach_check.py build pwned-passwords-sha1.txt breached.idx
+"""
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+
+MAGIC = b'SOBREACH'
+VERSION = 1
+HEADER = struct.Struct('<8sBBB5xQ')
+BUCKETS = 65536
+OFFSETS = struct.Struct(f'<{BUCKETS + 1}Q')
+ALGORITHMS = {'sha1': 1, 'ntlm': 2}
+DIGEST_SIZES = {'sha1': 20, 'ntlm': 16}
+# 8 bytes keeps false positives below one in a billion for a billion hashes
+DEFAULT_RECORD_LEN = 8
+SORT_CHUNK_RECORDS = 5_000_000
+
+
+def _md4(data):
+    # hashlib's md4 is gone with OpenSSL 3; NTLM needs it for one short input
+    def rotl(x, n):
+        x &= 0xFFFFFFFF
+        return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+    message = bytearray(data) + b'\x80'
+    message += b'\x00' * ((56 - len(message) % 64) % 64)
+    message += struct.pack('<Q', len(data) * 8)
+    a, b, c, d = 0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476
+    for offset in range(0, len(message), 64):
+        x = struct.unpack('<16I', message[offset:offset + 64])
+        aa, bb, cc, dd = a, b, c, d
+        for i in range(16):
+            k, s = i, (3, 7, 11, 19)[i % 4]
+            f = (b & c) | (~b & d)
+            a, b, c, d = d, rotl(a + f + x[k], s), b, c
+        for i in range(16):
+            k, s = (i % 4) * 4 + i // 4, (3, 5, 9, 13)[i % 4]
+            g = (b & c) | (b & d) | (c & d)
+            a, b, c, d = d, rotl(a + g + x[k] + 0x5A827999, s), b, c
+        for i in range(16):
+            k, s = (0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15)[i], (3, 9, 11, 15)[i % 4]
+            h = b ^ c ^ d
+            a, b, c, d = d, rotl(a + h + x[k] + 0x6ED9EBA1, s), b, c
+        a, b, c, d = [(v + w) & 0xFFFFFFFF for v, w in zip((a, b, c, d), (aa, bb, cc, dd))]
+    return struct.pack('<4I', a, b, c, d)
+
+
+def password_digest(password, algorithm):
+    if algorithm == 'sha1':
+        return hashlib.sha1(password.encode('utf-8')).digest()
+    if algorithm == 'ntlm':
+        return _md4(password.encode('utf-16-le'))
+    raise ValueError(f"Unknown hash algorithm: {algorithm}")
+
+
+class BreachIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, algorithm, record_len, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a breached password index")
+        self.algorithm = {code: name for name, code in ALGORITHMS.items()}[algorithm]
+        self.record_len = record_len
+        self.count = count
+        self._offsets = OFFSETS.unpack_from(self._mm, HEADER.size)
+        self._records = HEADER.size + OFFSETS.size
+
+    def __contains__(self, digest):
+        target = digest[:self.record_len]
+        bucket = int.from_bytes(target[:2], 'big')
+        lo, hi = self._offsets[bucket], self._offsets[bucket + 1]
+        mm, size, base = self._mm, self.record_len, self._records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * size
+            record = mm[start:start + size]
+            if record < target:
+                lo = mid + 1
+            elif record > target:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def is_breached(self, password):
+        return password_digest(password, self.algorithm) in self
+
+    def close(self):
+        self._mm.close()
+
+
+def _parse_dump(lines, algorithm, record_len, plaintext):
+    digest_hex_len = DIGEST_SIZES[algorithm] * 2
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if plaintext:
+            yield password_digest(line, algorithm)[:record_len]
+            continue
+        hex_hash = line.split(':', 1)[0]
+        if len(hex_hash) != digest_hex_len:
+            continue
+        try:
+            yield bytes.fromhex(hex_hash)[:record_len]
+        except ValueError:
+            continue
+
+
+def _sorted_runs(records, tmpdir, record_len):
+    """Sort records in bounded chunks and merge them, so dumps larger than RAM work"""
+    runs, chunk = [], []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= SORT_CHUNK_RECORDS:
+            runs.append(_write_run(sorted(chunk), tmpdir))
+            chunk = []
+    if not runs:
+        yield from sorted(chunk)
+        return
+    if chunk:
+        runs.append(_write_run(sorted(chunk), tmpdir))
+    yield from heapq.merge(*(_read_run(path, record_len) for path in runs))
+
+
+def _write_run(records, tmpdir):
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix='.run')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b''.join(records))
+    return path
+
+
+def _read_run(path, record_len):
+    with open(path, 'rb') as f:
+        while True:
+            record = f.read(record_len)
+            if len(record) < record_len:
+                break
+            yield record
+    os.remove(path)
+
+
+def build_index(lines, output_path, algorithm='sha1', record_len=DEFAULT_RECORD_LEN, plaintext=False):
+    """Write an index from dump lines; returns the number of unique records"""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {algorithm}")
+    if not 2 <= record_len <= DIGEST_SIZES[algorithm]:
+        raise ValueError(f"record_len must be between 2 and {DIGEST_SIZES[algorithm]}")
+
+    counts = [0] * BUCKETS
+    total = 0
+    tmp_path = output_path + '.tmp'
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmpdir, \
+            open(tmp_path, 'wb') as out:
+        out.seek(HEADER.size + OFFSETS.size)
+        previous = None
+        for record in _sorted_runs(_parse_dump(lines, algorithm, record_len, plaintext), tmpdir, record_len):
+            if record == previous:
+                continue
+            out.write(record)
+            counts[int.from_bytes(record[:2], 'big')] += 1
+            total += 1
+            previous = record
+
+        offsets, running = [], 0
+        for count in counts:
+            offsets.append(running)
+            running += count
+        offsets.append(running)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, ALGORITHMS[algorithm], record_len, total))
+        out.write(OFFSETS.pack(*offsets))
+    os.replace(tmp_path, output_path)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query an offline breached password index')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Build an index from a hash dump')
+    build.add_argument('dump', help="Text dump: one 'HASH' or 'HASH:count' per line ('-' for stdin)")
+    build.add_argument('output', help='Index file to write')
+    build.add_argument('--algorithm', choices=sorted(ALGORITHMS), default='sha1')
+    build.add_argument('--prefix-bytes', type=int, default=DEFAULT_RECORD_LEN,
+                       help='Bytes of each hash to keep (default: %(default)s)')
+    build.add_argument('--plaintext', action='store_true', help='Dump contains passwords, not hashes')
+
+    check = commands.add_parser('check', help='Check whether a password is in an index')
+    check.add_argument('index')
+    check.add_argument('password')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        if args.dump == '-':
+            total = build_index(sys.stdin, args.output, args.algorithm, args.prefix_bytes, args.plaintext)
+        else:
+            with open(args.dump, encoding='utf-8', errors='replace') as lines:
+                total = build_index(lines, args.output, args.algorithm, args.prefix_bytes, args.plaintext)
+        print(f"Wrote {total} hashes to {args.output}")
+        return 0
+
+    index = BreachIndex(args.index)
+    breached = index.is_breached(args.password)
+    print('breached' if breached else 'not found')
+    return 1 if breached else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+gzip/brotli response compression negotiated from Accept-Encoding.
+
+Buffered responses under ``COMPRESSION_MIN_SIZE`` bytes are sent as-is.
+Streamed responses of unknown length are compressed chunk by chunk and
+flushed after every chunk so the client still receives data incrementally.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, fall back to gzip only
+    brotli = None
+
+from flask import request
+
+from server_timing import span
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+}
+
+
+def choose_encoding(accept_encodings):
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['BROTLI_QUALITY'])
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits=31 produces a gzip container
+    compressor = zlib.compressobj(config['COMPRESSION_LEVEL'], zlib.DEFLATED, 31)
+    return (compressor.compress,
+            lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush)
+
+
+def compress_bytes(data, encoding, config):
+    compress, _, finish = _compressor(encoding, config)
+    return compress(data) + finish()
+
+
+def _compress_stream(chunks, encoding, config):
+    compress, flush, finish = _compressor(encoding, config)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def should_compress(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers or request.method == 'HEAD':
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    return 'no-transform' not in response.headers.get('Cache-Control', '')
+
+
+def compress_response(response, config):
+    if not should_compress(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    length = response.content_length
+    if length is not None and length < config['COMPRESSION_MIN_SIZE']:
+        return response
+
+    # send_file responses are iterated through get_data/response below
+    response.direct_passthrough = False
+
+    if response.is_streamed and length is None:
+        response.response = _compress_stream(response.response, encoding, config)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        with span(f'compress.{encoding}'):
+            response.set_data(compress_bytes(data, encoding, config))
+
+    response.headers['Content-Encoding'] = encoding
+    # Same resource, different bytes: keep conditional requests working
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESSION_ENABLED', True)
+    app.config.setdefault('COMPRESSION_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESSION_LEVEL', 6)
+    app.config.setdefault('BROTLI_QUALITY', 5)
+
+    @app.after_request
+    def compress(response):
+        if not app.config['COMPRESSION_ENABLED']:
+            return response
+        return compress_response(response, app.config)
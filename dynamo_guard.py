@@ -0,0 +1,201 @@
+"""
+Circuit breaker and hedged reads around DynamoDB tables.
+
+``GuardedTable`` wraps a boto3 Table. Each table has a ``CircuitBreaker``
+that opens when the recent error rate (throttling, 5xx, timeouts) crosses a
+threshold; while open, calls fail immediately with ``CircuitOpenError``
+instead of tying up a worker in the botocore retry chain. After a cool-down
+one trial call is let through (half-open) to decide whether to close again.
+
+Idempotent reads (``get_item``, ``query``) can optionally be hedged: if the
+first request hasn't answered after the recent p95 latency for that
+operation, a second identical request is sent and whichever finishes first
+wins. Hedged requests look the operation up on the wrapped table from the
+pool thread, so a per-thread table proxy (see dynamo_resources.py) never
+shares a boto3 resource across threads.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.exceptions import BotoCoreError, ClientError, ParamValidationError
+
+from server_timing import span
+
+
+# Error codes that mean DynamoDB (not the request) is in trouble
+FAILURE_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable',
+}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, table_name, retry_after):
+        super().__init__(f"DynamoDB table {table_name} is unavailable (circuit open)")
+        self.table_name = table_name
+        self.retry_after = retry_after
+
+
+def is_failure(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in FAILURE_CODES
+    # Connection errors, timeouts, missing credentials; not our own bad parameters
+    return isinstance(error, BotoCoreError) and not isinstance(error, ParamValidationError)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_ratio=0.5, min_calls=10, window_seconds=30, open_seconds=15):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._events = deque()
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return 'closed'
+        if now - self._opened_at >= self.open_seconds:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(now)
+            if state == 'open' or (state == 'half-open' and self._trial_in_flight):
+                remaining = max(1, int(self.open_seconds - (now - self._opened_at) + 0.999))
+                raise CircuitOpenError(self.name, remaining)
+            if state == 'half-open':
+                self._trial_in_flight = True
+
+    def record(self, failed):
+        now = time.monotonic()
+        with self._lock:
+            if self._state(now) == 'half-open':
+                self._trial_in_flight = False
+                if failed:
+                    self._opened_at = now
+                else:
+                    self._opened_at = None
+                    self._events.clear()
+                return
+            self._events.append((now, failed))
+            while self._events and now - self._events[0][0] > self.window_seconds:
+                self._events.popleft()
+            failures = sum(1 for _, event_failed in self._events if event_failed)
+            if len(self._events) >= self.min_calls and failures / len(self._events) >= self.failure_ratio:
+                self._opened_at = now
+                self._events.clear()
+
+
+class LatencyTracker:
+    def __init__(self, size=200, min_samples=20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def p95(self):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class GuardedTable:
+    HEDGEABLE = ('get_item', 'query')
+
+    def __init__(self, table, breaker, hedge_executor=None, min_hedge_delay=0.005):
+        self._table = table
+        self.breaker = breaker
+        self.hedge_executor = hedge_executor
+        self.min_hedge_delay = min_hedge_delay
+        self._latency = {name: LatencyTracker() for name in self.HEDGEABLE}
+
+    def __getattr__(self, name):
+        # Anything not guarded (name, meta, batch_writer, ...) goes straight through
+        return getattr(self._table, name)
+
+    def get_item(self, **kwargs):
+        return self._call('get_item', kwargs)
+
+    def query(self, **kwargs):
+        return self._call('query', kwargs)
+
+    def scan(self, **kwargs):
+        return self._call('scan', kwargs)
+
+    def put_item(self, **kwargs):
+        return self._call('put_item', kwargs)
+
+    def update_item(self, **kwargs):
+        return self._call('update_item', kwargs)
+
+    def delete_item(self, **kwargs):
+        return self._call('delete_item', kwargs)
+
+    def _call(self, operation, kwargs):
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            if self.hedge_executor is not None and operation in self.HEDGEABLE:
+                result = self._hedged(operation, kwargs)
+            else:
+                result = getattr(self._table, operation)(**kwargs)
+        except Exception as e:
+            self.breaker.record(is_failure(e))
+            raise
+        self.breaker.record(False)
+        if operation in self._latency:
+            self._latency[operation].add(time.perf_counter() - started)
+        return result
+
+    def _hedged(self, operation, kwargs):
+        p95 = self._latency[operation].p95()
+        if p95 is None:
+            return self._invoke(operation, kwargs)
+
+        with span(f'hedge.{operation}'):
+            first = self.hedge_executor.submit(self._invoke, operation, kwargs)
+            done, _ = wait([first], timeout=max(p95, self.min_hedge_delay))
+            if done:
+                return first.result()
+            second = self.hedge_executor.submit(self._invoke, operation, kwargs)
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            raise error
+
+    def _invoke(self, operation, kwargs):
+        # Resolved in the calling thread, which matters for per-thread tables
+        return getattr(self._table, operation)(**kwargs)
+
+
+def new_hedge_executor(max_workers=16):
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dynamodb-hedge')
+
+
+def guard_table(table, name=None, hedge_executor=None, **breaker_options):
+    """Wrap a boto3 Table in a GuardedTable with its own breaker"""
+    breaker = CircuitBreaker(name or table.name, **breaker_options)
+    return GuardedTable(table, breaker, hedge_executor=hedge_executor)
@@ -0,0 +1,112 @@
+"""
+Lazily created DynamoDB resource, client and tables for one app.
+
+Nothing here talks to botocore until a table or the client is first used:
+``table()`` and ``raw_table()`` return proxies that build the boto3 resource
+on first attribute access. Creating an app (or importing it in a test)
+therefore costs no boto3 session, and each app gets its own clients and
+circuit breakers. Tables passed in ``tables`` (tests, benchmarks) are
+returned as-is, without a breaker.
+
+boto3 resources (and their Table objects) are not thread-safe, so each
+thread gets its own resource, built from its own boto3 session; the table
+proxies resolve to the calling thread's Table. Low-level clients are
+thread-safe, so ``client`` is shared.
+"""
+import threading
+
+import boto3
+from botocore.config import Config
+from werkzeug.local import LocalProxy
+
+from dynamo_guard import guard_table, new_hedge_executor
+
+
+# Logical table name -> config key holding the DynamoDB table name
+TABLE_CONFIG_KEYS = {
+    'users': 'DYNAMODB_USERS_TABLE',
+    'passwords': 'DYNAMODB_PASSWORDS_TABLE',
+    'sessions': 'DYNAMODB_SESSIONS_TABLE',
+    'audit': 'DYNAMODB_AUDIT_TABLE',
+}
+
+
+class DynamoDBResources:
+    def __init__(self, config, tables=None, on_client_created=None):
+        self.config = config
+        self.on_client_created = on_client_created
+        self._injected = dict(tables or {})
+        self._guarded = {}
+        self._local = threading.local()
+        self._resources_created = 0
+        self._client = None
+        self._hedge_executor = None
+        self._lock = threading.Lock()
+        # Proxies, so collaborators can hold on to the client before it exists
+        self.client = LocalProxy(self._get_client)
+
+    def table_name(self, name):
+        return self.config[TABLE_CONFIG_KEYS[name]]
+
+    def table(self, name):
+        """Table with a circuit breaker (and hedged reads if enabled)"""
+        if name in self._injected:
+            return self._injected[name]
+        with self._lock:
+            if name not in self._guarded:
+                self._guarded[name] = guard_table(
+                    self.raw_table(name),
+                    name=self.table_name(name),
+                    hedge_executor=self._get_hedge_executor(),
+                    failure_ratio=self.config['DYNAMODB_BREAKER_FAILURE_RATIO'],
+                    min_calls=self.config['DYNAMODB_BREAKER_MIN_CALLS'],
+                    window_seconds=self.config['DYNAMODB_BREAKER_WINDOW'],
+                    open_seconds=self.config['DYNAMODB_BREAKER_OPEN_SECONDS']
+                )
+            return self._guarded[name]
+
+    def raw_table(self, name):
+        """Table without the breaker, e.g. for readiness probes"""
+        if name in self._injected:
+            return self._injected[name]
+        return LocalProxy(lambda: self._get_resource().Table(self.table_name(name)))
+
+    def _session_kwargs(self):
+        kwargs = {
+            'region_name': self.config['AWS_REGION'],
+            'config': Config(
+                retries={'max_attempts': self.config['DYNAMODB_MAX_ATTEMPTS'], 'mode': 'standard'},
+                connect_timeout=self.config['DYNAMODB_CONNECT_TIMEOUT'],
+                read_timeout=self.config['DYNAMODB_READ_TIMEOUT']
+            )
+        }
+        if self.config.get('AWS_ENDPOINT'):
+            kwargs['endpoint_url'] = self.config['AWS_ENDPOINT']
+        return kwargs
+
+    def _get_resource(self):
+        resource = getattr(self._local, 'resource', None)
+        if resource is None:
+            resource = boto3.session.Session().resource('dynamodb', **self._session_kwargs())
+            if self.on_client_created:
+                self.on_client_created(resource.meta.client)
+            self._local.resource = resource
+            with self._lock:
+                self._resources_created += 1
+        return resource
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    client = boto3.client('dynamodb', **self._session_kwargs())
+                    if self.on_client_created:
+                        self.on_client_created(client)
+                    self._client = client
+        return self._client
+
+    def _get_hedge_executor(self):
+        # Called with the lock held
+        if self._hedge_executor is None and self.config['DYNAMODB_HEDGED_READS']:
+            self._hedge_executor = new_hedge_executor()
+        return self._hedge_executor
@@ -0,0 +1,71 @@
+"""
+Versioned ciphertext for vault entry passwords.
+
+Version 1 (current) is stored as DynamoDB binary::
+
+    0x01 | 12-byte nonce | AES-256-GCM ciphertext + 16-byte tag
+
+The associated data binds the ciphertext to ``user_id`` and ``password_id``,
+so a value copied onto another entry or user fails to decrypt. The AES key is
+derived from the vault data key with HMAC-SHA256.
+
+Version 0 is the original Fernet token, stored as a base64 string (no version
+byte of ours; a ``str`` value means Fernet). It is still readable and is
+rewritten to version 1 when the entry is next read or saved.
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+from boto3.dynamodb.types import Binary
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from server_timing import span
+
+
+VERSION_AESGCM = 1
+NONCE_SIZE = 12
+
+
+def aead_key(encryption_key):
+    return hmac.new(base64.urlsafe_b64decode(encryption_key), b'vault-entry-aes-gcm-v1', hashlib.sha256).digest()
+
+
+def associated_data(user_id, password_id):
+    return f'{user_id}\x00{password_id}'.encode('utf-8')
+
+
+def encrypt(plaintext, encryption_key, user_id, password_id):
+    with span('aesgcm.encrypt'):
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = AESGCM(aead_key(encryption_key)).encrypt(
+            nonce, plaintext.encode('utf-8'), associated_data(user_id, password_id))
+    return bytes([VERSION_AESGCM]) + nonce + sealed
+
+
+def decrypt(stored, encryption_key, user_id, password_id):
+    """Plaintext for any supported version; ValueError if it can't be decrypted"""
+    if isinstance(stored, str):
+        try:
+            with span('fernet.decrypt'):
+                return Fernet(encryption_key).decrypt(stored.encode('utf-8')).decode('utf-8')
+        except InvalidToken:
+            raise ValueError("Unable to decrypt password")
+
+    blob = stored.value if isinstance(stored, Binary) else bytes(stored)
+    if not blob or blob[0] != VERSION_AESGCM:
+        raise ValueError(f"Unsupported ciphertext version {blob[0] if blob else None}")
+    try:
+        with span('aesgcm.decrypt'):
+            return AESGCM(aead_key(encryption_key)).decrypt(
+                blob[1:1 + NONCE_SIZE], blob[1 + NONCE_SIZE:], associated_data(user_id, password_id)
+            ).decode('utf-8')
+    except InvalidTag:
+        raise ValueError("Unable to decrypt password")
+
+
+def needs_upgrade(stored):
+    return isinstance(stored, str)
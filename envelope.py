@@ -0,0 +1,68 @@
+"""
+Envelope encryption for vault keys.
+
+Vault entries are encrypted with a per-user data key. The data key is
+stored only in wrapped form on the user item:
+
+- ``wrapped_data_key``: under a key derived from the login password
+  (PBKDF2 with a per-user salt)
+- ``recovery_wrapped_data_key``: under a key derived from a server-side
+  recovery secret and the user's TOTP secret, used only after a TOTP
+  verified password reset
+
+Changing or resetting the login password rewraps the data key (one small
+attribute) instead of re-encrypting every vault entry.
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from server_timing import span
+
+
+PBKDF2_ITERATIONS = 200000
+
+
+def generate_data_key():
+    return Fernet.generate_key()
+
+
+def new_salt():
+    return base64.b64encode(os.urandom(16)).decode('ascii')
+
+
+def password_kek(password, salt):
+    with span('kdf.pbkdf2'):
+        raw = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), base64.b64decode(salt), PBKDF2_ITERATIONS)
+    return base64.urlsafe_b64encode(raw)
+
+
+def recovery_kek(recovery_secret, user_id, totp_secret):
+    raw = hmac.new(recovery_secret.encode('utf-8'), f'{user_id}:{totp_secret}'.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(raw)
+
+
+def wrap_key(data_key, kek):
+    return Fernet(kek).encrypt(data_key).decode('ascii')
+
+
+def unwrap_key(wrapped, kek):
+    try:
+        return Fernet(kek).decrypt(wrapped.encode('ascii'))
+    except InvalidToken:
+        raise ValueError("Unable to unwrap vault key")
+
+
+def wrapped_key_attributes(data_key, user_id, password, totp_secret, recovery_secret):
+    """User item attributes holding ``data_key`` wrapped for login and recovery"""
+    salt = new_salt()
+    attributes = {
+        'kek_salt': salt,
+        'wrapped_data_key': wrap_key(data_key, password_kek(password, salt))
+    }
+    if totp_secret:
+        attributes['recovery_wrapped_data_key'] = wrap_key(data_key, recovery_kek(recovery_secret, user_id, totp_secret))
+    return attributes
@@ -0,0 +1,235 @@
+"""
+Opt-in sampled request profiler.
+
+A fraction of requests (``PROFILE_SAMPLE_RATE``), plus any request carrying
+a valid signed ``X-Profile-Request`` token, run under cProfile while a
+background thread samples the request thread's stack. Results are
+aggregated per endpoint in memory and written to ``PROFILE_DIR`` at most
+every ``PROFILE_FLUSH_SECONDS``:
+
+    <endpoint>-<timestamp>-<pid>-<n>.pstats      load with pstats / snakeviz
+    <endpoint>-<timestamp>-<pid>-<n>.collapsed   "frame;frame;frame count" lines
+                                                 for flamegraph.pl / speedscope
+
+Only the newest ``PROFILE_KEEP`` dumps per endpoint are kept. With the
+sample rate at 0 and no header secret, ``init_app`` registers nothing, so a
+disabled profiler costs nothing per request. One request per process is
+profiled at a time (cProfile is process-wide on newer Pythons); others that
+are picked meanwhile simply run unprofiled.
+
+Mint a debug header token (valid for ``--ttl`` seconds) with:
+
+    PROFILE_HEADER_SECRET=... python profiling.py token --ttl 600
+"""
+import argparse
+import atexit
+import cProfile
+import glob
+import hashlib
+import hmac
+import itertools
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+
+HEADER = 'X-Profile-Request'
+# Stack sampling period while a request is profiled
+SAMPLE_INTERVAL = 0.005
+# Deepest stack kept in collapsed output; deeper frames are cut at the root side
+MAX_STACK_DEPTH = 128
+
+
+def sign_token(secret, expires):
+    digest = hmac.new(secret.encode('utf-8'), str(int(expires)).encode('ascii'), hashlib.sha256).hexdigest()
+    return f'{int(expires)}.{digest}'
+
+
+def verify_token(secret, token, now=None):
+    expires, _, _ = (token or '').partition('.')
+    if not secret or not expires.isdigit():
+        return False
+    if int(expires) < (now if now is not None else time.time()):
+        return False
+    return hmac.compare_digest(sign_token(secret, int(expires)), token)
+
+
+def frame_label(code):
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+class StackSampler:
+    """Counts collapsed stacks of one thread, sampled from a helper thread"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+
+class _RouteProfile:
+    def __init__(self):
+        self.stats = None
+        self.stacks = Counter()
+        self.requests = 0
+
+
+class RequestProfiler:
+    def __init__(self, directory, keep=20, flush_seconds=60):
+        self.directory = directory
+        self.keep = keep
+        self.flush_seconds = flush_seconds
+        self._routes = {}
+        self._last_flush = {}
+        self._dump_numbers = itertools.count()
+        self._lock = threading.Lock()
+        # Held for the whole profiled request; see the module docstring
+        self._active = threading.Lock()
+
+    def begin(self):
+        """Start profiling the current thread; None if another request holds the profiler"""
+        if not self._active.acquire(blocking=False):
+            return None
+        try:
+            profile = cProfile.Profile()
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            profile.enable()
+        except Exception:
+            self._active.release()
+            raise
+        return profile, sampler
+
+    def end(self, session, route):
+        profile, sampler = session
+        try:
+            profile.disable()
+            stacks = sampler.stop()
+        finally:
+            self._active.release()
+        self.add(route, profile, stacks)
+
+    def add(self, route, profile, stacks):
+        with self._lock:
+            entry = self._routes.setdefault(route, _RouteProfile())
+            if entry.stats is None:
+                entry.stats = pstats.Stats(profile)
+            else:
+                entry.stats.add(profile)
+            entry.stacks.update(stacks)
+            entry.requests += 1
+            # A route's first profile is written at once, later ones at most every flush_seconds
+            last = self._last_flush.get(route)
+            due = last is None or time.monotonic() - last >= self.flush_seconds
+        if due:
+            self.flush(route)
+
+    def flush(self, route=None):
+        """Write aggregated profiles (one route, or all) and start new aggregates"""
+        with self._lock:
+            routes = [route] if route is not None else list(self._routes)
+            pending = [(name, self._routes.pop(name)) for name in routes if name in self._routes]
+            for name, _ in pending:
+                self._last_flush[name] = time.monotonic()
+        for name, entry in pending:
+            try:
+                self._write(name, entry)
+            except OSError as e:
+                print(f"WARNING: could not write profile for {name}: {e}", file=sys.stderr)
+
+    def _write(self, route, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', route)
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        base = os.path.join(self.directory, f'{safe}-{stamp}-{os.getpid()}-{next(self._dump_numbers)}')
+        entry.stats.dump_stats(base + '.pstats')
+        with open(base + '.collapsed', 'w', encoding='utf-8') as out:
+            for stack, count in entry.stacks.most_common():
+                out.write(f'{stack} {count}\n')
+        self._rotate(safe)
+
+    def _rotate(self, safe_route):
+        dumps = sorted(glob.glob(os.path.join(glob.escape(self.directory), f'{glob.escape(safe_route)}-*.pstats')),
+                       key=lambda path: (os.path.getmtime(path), path), reverse=True)
+        for path in dumps[self.keep:]:
+            for stale in (path, path[:-len('.pstats')] + '.collapsed'):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+
+def init_app(app):
+    rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    secret = app.config.get('PROFILE_HEADER_SECRET', '')
+    if not rate and not secret:
+        return None
+
+    profiler = RequestProfiler(app.config['PROFILE_DIR'], keep=app.config.get('PROFILE_KEEP', 20),
+                               flush_seconds=app.config.get('PROFILE_FLUSH_SECONDS', 60))
+    atexit.register(profiler.flush)
+
+    @app.before_request
+    def start_profile():
+        token = request.headers.get(HEADER)
+        if token is not None:
+            chosen = verify_token(secret, token)
+        else:
+            chosen = rate and random.random() < rate
+        if chosen:
+            g._profile = profiler.begin()
+
+    @app.teardown_request
+    def finish_profile(exc):
+        session = g.pop('_profile', None)
+        if session is not None:
+            profiler.end(session, request.endpoint or 'unmatched')
+
+    return profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Request profiler helpers')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    token = commands.add_parser('token', help=f'Mint a signed {HEADER} header value')
+    token.add_argument('--ttl', type=int, default=600, help='Seconds the token is valid (default: %(default)s)')
+
+    args = parser.parse_args(argv)
+    secret = os.getenv('PROFILE_HEADER_SECRET', '')
+    if not secret:
+        print('PROFILE_HEADER_SECRET is not set', file=sys.stderr)
+        return 1
+    print(f'{HEADER}: {sign_token(secret, time.time() + args.ttl)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
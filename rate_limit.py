@@ -0,0 +1,95 @@
+"""
+Token bucket rate limiting.
+
+Buckets live in a pluggable ``BucketStore``. ``MemoryBucketStore`` keeps them
+in-process, which is enough for a single node; a deployment with several
+instances can supply a shared store implementing the same interface.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def parse_rate(value):
+    """Parse an 'attempts/seconds' string into (capacity, tokens per second)"""
+    attempts, _, seconds = str(value).partition('/')
+    capacity = int(attempts)
+    period = float(seconds or 60)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    return capacity, capacity / period
+
+
+class BucketStore(ABC):
+    """Storage for token buckets.
+
+    ``consume`` must take one token from the bucket identified by ``key`` and
+    return ``(allowed, retry_after_seconds)``. Shared implementations have to
+    do the refill-and-take atomically (e.g. a conditional write or a server
+    side script) so concurrent workers cannot overspend a bucket.
+    """
+
+    @abstractmethod
+    def consume(self, key, capacity, refill_rate, now=None):
+        """Take one token; return (allowed, retry_after_seconds)"""
+
+    @abstractmethod
+    def reset(self, key):
+        """Drop the bucket so the key starts with a full one again"""
+
+
+class MemoryBucketStore(BucketStore):
+    """In-process bucket store, bounded to ``max_keys`` buckets (LRU)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                allowed, retry_after = True, 0.0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class TokenBucketLimiter:
+    def __init__(self, store, rate, prefix):
+        self.store = store
+        self.capacity, self.refill_rate = parse_rate(rate)
+        self.prefix = prefix
+
+    def hit(self, key):
+        return self.store.consume(f'{self.prefix}:{key}', self.capacity, self.refill_rate)
+
+    def reset(self, key):
+        self.store.reset(f'{self.prefix}:{key}')
+
+
+def client_ip(request, trusted_proxies=1):
+    """Best guess at the client address behind ``trusted_proxies`` load balancers.
+
+    Each proxy appends the address it received the connection from to
+    X-Forwarded-For, so only the last ``trusted_proxies`` entries can be
+    trusted; anything to the left of them is client supplied.
+    """
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    if forwarded and trusted_proxies > 0:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(trusted_proxies, len(hops))]
+    return request.remote_addr or 'unknown'
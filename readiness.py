@@ -0,0 +1,101 @@
+"""
+Cached dependency readiness.
+
+A background thread periodically checks DynamoDB (DescribeTable on each
+table plus a canary GetItem) and keeps the last result in memory, so the
+``/ready`` endpoint answers load balancer probes without any AWS call.
+"""
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+
+CANARY_KEY = '__readiness_canary__'
+
+
+class ReadinessChecker:
+    def __init__(self, client, tables, canary_table, canary_key, interval=15, max_age=None):
+        self.client = client
+        self.tables = list(tables)
+        self.canary_table = canary_table
+        self.canary_key = canary_key
+        self.interval = interval
+        self.max_age = max_age if max_age is not None else interval * 3
+        self._result = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def check_now(self):
+        started = time.perf_counter()
+        checks = {}
+        for table_name in self.tables:
+            checks[f'describe:{table_name}'] = self._run(
+                lambda name=table_name: self._describe(name))
+        checks['canary_get_item'] = self._run(
+            lambda: self.canary_table.get_item(Key=self.canary_key))
+        result = {
+            'ready': all(check['ok'] for check in checks.values()),
+            'checks': checks,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'checked_at': time.time()
+        }
+        with self._lock:
+            self._result = result
+        return result
+
+    def _describe(self, table_name):
+        status = self.client.describe_table(TableName=table_name)['Table']['TableStatus']
+        if status not in ('ACTIVE', 'UPDATING'):
+            raise RuntimeError(f'table status {status}')
+
+    @staticmethod
+    def _run(check):
+        started = time.perf_counter()
+        try:
+            check()
+            outcome = {'ok': True}
+        except ClientError as e:
+            outcome = {'ok': False, 'error': e.response.get('Error', {}).get('Code', 'ClientError')}
+        except (BotoCoreError, RuntimeError) as e:
+            outcome = {'ok': False, 'error': str(e)}
+        outcome['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return outcome
+
+    def status(self):
+        """Latest result with its age; not ready if missing or stale"""
+        self.start()
+        with self._lock:
+            result = self._result
+        if result is None:
+            return {'ready': False, 'reason': 'no check completed yet'}
+        age = time.time() - result['checked_at']
+        status = dict(result, age_seconds=round(age, 3))
+        if age > self.max_age:
+            status['ready'] = False
+            status['reason'] = 'last check is stale'
+        return status
+
+    def start(self):
+        # Started lazily so each gunicorn worker (post-fork) runs its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='readiness-checker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.check_now()
+            except Exception as e:  # never let the checker thread die
+                with self._lock:
+                    self._result = {'ready': False, 'checks': {}, 'error': str(e), 'checked_at': time.time()}
+            self._stop.wait(self.interval)
@@ -0,0 +1,165 @@
+"""
+Per-request span recorder.
+
+Times DynamoDB calls, key derivation, bcrypt/Fernet work and template
+rendering for the current request. The aggregated timings can be sent to
+the browser as a ``Server-Timing`` header and requests slower than a
+threshold are logged as a JSON span tree.
+"""
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from flask import before_render_template, g, has_app_context, request, template_rendered
+
+
+# Stop recording individual spans past this point; totals are still kept
+MAX_SPANS = 500
+
+
+class SpanRecorder:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.roots = []
+        self.totals = {}
+        self._stack = []
+        self._count = 0
+
+    def start(self, name):
+        node = {'name': name, 'start': time.perf_counter(), 'children': []}
+        self._count += 1
+        if self._count <= MAX_SPANS:
+            parent = self._stack[-1]['children'] if self._stack else self.roots
+            parent.append(node)
+        self._stack.append(node)
+        return node
+
+    def end(self, node):
+        duration = time.perf_counter() - node['start']
+        node['dur_ms'] = round(duration * 1000, 3)
+        total = self.totals.setdefault(node['name'], [0, 0.0])
+        total[0] += 1
+        total[1] += duration
+        # Unwind anything left open by an exception inside the span
+        while self._stack:
+            if self._stack.pop() is node:
+                break
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def header_value(self):
+        metrics = []
+        for name, (count, total) in self.totals.items():
+            desc = f'{count} call' if count == 1 else f'{count} calls'
+            metrics.append(f'{name};dur={total * 1000:.2f};desc="{desc}"')
+        metrics.append(f'total;dur={self.elapsed_ms():.2f}')
+        return ', '.join(metrics)
+
+    def tree(self):
+        def convert(node):
+            item = {
+                'name': node['name'],
+                'offset_ms': round((node['start'] - self.started) * 1000, 3),
+                'dur_ms': node.get('dur_ms'),
+            }
+            if node['children']:
+                item['children'] = [convert(child) for child in node['children']]
+            return item
+        return [convert(node) for node in self.roots]
+
+
+def current_recorder():
+    if not has_app_context():
+        return None
+    return g.get('_span_recorder')
+
+
+@contextmanager
+def span(name):
+    recorder = current_recorder()
+    if recorder is None:
+        yield
+        return
+    node = recorder.start(name)
+    try:
+        yield
+    finally:
+        recorder.end(node)
+
+
+def apply_server_timing(response):
+    recorder = current_recorder()
+    if recorder is not None:
+        response.headers['Server-Timing'] = recorder.header_value()
+    return response
+
+
+def _before_dynamodb_call(model, context, **kwargs):
+    recorder = current_recorder()
+    if recorder is not None:
+        context['_span'] = recorder.start(f'dynamodb.{model.name}')
+
+
+def _after_dynamodb_call(context, **kwargs):
+    recorder = current_recorder()
+    node = context.pop('_span', None)
+    if recorder is not None and node is not None:
+        recorder.end(node)
+
+
+def instrument_boto_client(client):
+    # Runs for every operation on the client, including the ones made
+    # through boto3 resources (resource.meta.client)
+    events = client.meta.events
+    events.register('before-call.dynamodb', _before_dynamodb_call)
+    events.register('after-call.dynamodb', _after_dynamodb_call)
+    events.register('after-call-error.dynamodb', _after_dynamodb_call)
+
+
+def init_app(app, boto_clients=()):
+    enabled = app.config.get('SERVER_TIMING_ENABLED', False)
+    slow_ms = app.config.get('SLOW_REQUEST_LOG_MS', 0)
+    if not enabled and not slow_ms:
+        return
+
+    for client in boto_clients:
+        instrument_boto_client(client)
+
+    @app.before_request
+    def start_span_recorder():
+        g._span_recorder = SpanRecorder()
+
+    @app.after_request
+    def log_slow_request(response):
+        recorder = current_recorder()
+        if recorder is None or not slow_ms:
+            return response
+        elapsed = recorder.elapsed_ms()
+        if elapsed >= slow_ms:
+            print(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'dur_ms': round(elapsed, 3),
+                'spans': recorder.tree(),
+            }), file=sys.stderr)
+        return response
+
+    def _template_started(sender, template, context, **extra):
+        recorder = current_recorder()
+        if recorder is not None:
+            g._template_spans = getattr(g, '_template_spans', [])
+            g._template_spans.append(recorder.start(f'template.{template.name}'))
+
+    def _template_finished(sender, template, context, **extra):
+        recorder = current_recorder()
+        stack = getattr(g, '_template_spans', None)
+        if recorder is not None and stack:
+            recorder.end(stack.pop())
+
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
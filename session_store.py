@@ -0,0 +1,236 @@
+"""
+Server-side sessions.
+
+The cookie only carries an opaque session ID; the session data stays on the
+server in a ``SessionStore``. ``MemorySessionStore`` (an LRU with TTL) is the
+default for a single instance, ``DynamoDBSessionStore`` can be shared between
+instances. Both slide a session's expiry forward when it is read.
+
+Anonymous sessions that only hold a CSRF token (every page renders one) are
+not stored: they travel in a separate signed cookie until the session gains
+login, registration or reset state. Anonymous page views therefore cannot
+evict signed-in users from the LRU or cost a DynamoDB write.
+"""
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+from flask import request
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+from itsdangerous import BadSignature
+
+
+# Keys an anonymous visitor's session can hold without being stored server-side
+ANONYMOUS_KEYS = frozenset({'csrf_token', '_flashes', '_permanent'})
+# DynamoDB sessions push expires_at forward at most this often (saves a write per request)
+EXPIRY_REFRESH_SECONDS = 60
+
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, new=False):
+        super().__init__(initial)
+        self.sid = sid or new_session_id()
+        self.new = new
+        self.stale_sid = None
+
+    def regenerate(self):
+        # New ID for the same data, e.g. after login to prevent session fixation
+        if not self.new:
+            self.stale_sid = self.sid
+        self.sid = new_session_id()
+        self.new = True
+        self.modified = True
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+class SessionStore(ABC):
+    """Storage backend for server-side sessions"""
+
+    @abstractmethod
+    def get(self, sid):
+        """Stored session data, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, sid, data, ttl):
+        """Store session data for ttl seconds"""
+
+    @abstractmethod
+    def delete(self, sid):
+        """Remove the session if present"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store; expiry slides forward on every read"""
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            data, ttl, expires_at = entry
+            if expires_at <= now:
+                del self._entries[sid]
+                return None
+            self._entries[sid] = (data, ttl, now + ttl)
+            self._entries.move_to_end(sid)
+            return dict(data)
+
+    def set(self, sid, data, ttl):
+        with self._lock:
+            self._entries[sid] = (dict(data), ttl, time.monotonic() + ttl)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DynamoDBSessionStore(SessionStore):
+    """Shared store; expired items are removed by the table's TTL on ``expires_at``"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, sid):
+        response = self.table.get_item(Key={'session_id': sid}, ConsistentRead=True)
+        item = response.get('Item')
+        now = time.time()
+        # TTL deletion is lazy, so check expiry ourselves
+        if not item or int(item.get('expires_at', 0)) <= now:
+            return None
+        # Slide the expiry like MemorySessionStore, to within EXPIRY_REFRESH_SECONDS
+        if 'ttl' in item and now + int(item['ttl']) - int(item['expires_at']) >= EXPIRY_REFRESH_SECONDS:
+            self._refresh(sid, int(now + int(item['ttl'])))
+        return self.serializer.loads(item['data'])
+
+    def set(self, sid, data, ttl):
+        self.table.put_item(Item={
+            'session_id': sid,
+            'data': self.serializer.dumps(dict(data)),
+            'ttl': int(ttl),
+            'expires_at': int(time.time() + ttl)
+        })
+
+    def _refresh(self, sid, expires_at):
+        try:
+            self.table.update_item(
+                Key={'session_id': sid},
+                UpdateExpression='SET expires_at = :expires_at',
+                # Don't resurrect a session deleted (logged out) meanwhile
+                ConditionExpression='attribute_exists(session_id)',
+                ExpressionAttributeValues={':expires_at': expires_at}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def delete(self, sid):
+        self.table.delete_item(Key={'session_id': sid})
+
+
+def is_anonymous(session):
+    return set(session) <= ANONYMOUS_KEYS
+
+
+class ServerSideSessionInterface(SessionInterface):
+    def __init__(self, store, ttl=12 * 3600):
+        self.store = store
+        self.ttl = ttl
+        self._cookie_sessions = SecureCookieSessionInterface()
+
+    def anonymous_cookie_name(self, app):
+        return f'{self.get_cookie_name(app)}_anon'
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(self._load_anonymous(app, request), new=True)
+
+    def _load_anonymous(self, app, request):
+        value = request.cookies.get(self.anonymous_cookie_name(app))
+        serializer = self._cookie_sessions.get_signing_serializer(app)
+        if not value or serializer is None:
+            return None
+        try:
+            data = serializer.loads(value, max_age=self.ttl)
+        except BadSignature:
+            return None
+        return data if is_anonymous(data) else None
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.stale_sid:
+            self.store.delete(session.stale_sid)
+            session.stale_sid = None
+
+        if not session or is_anonymous(session):
+            if session.modified and not session.new:
+                # Logged out (or back to CSRF-only): drop the stored copy
+                self.store.delete(session.sid)
+                self._delete_cookie(app, response, name)
+            if session.modified:
+                self._save_anonymous(app, session, response)
+            return
+
+        if session.modified and self.anonymous_cookie_name(app) in request.cookies:
+            self._delete_cookie(app, response, self.anonymous_cookie_name(app))
+
+        if session.modified:
+            self.store.set(session.sid, session, self.ttl)
+
+        if session.new or session.modified:
+            response.set_cookie(name, session.sid,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app),
+                                domain=domain, path=path,
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
+
+    def _save_anonymous(self, app, session, response):
+        anonymous_name = self.anonymous_cookie_name(app)
+        if not session:
+            if anonymous_name in request.cookies:
+                self._delete_cookie(app, response, anonymous_name)
+            return
+        serializer = self._cookie_sessions.get_signing_serializer(app)
+        response.set_cookie(anonymous_name, serializer.dumps(dict(session)),
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=self.get_cookie_domain(app), path=self.get_cookie_path(app),
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+    def _delete_cookie(self, app, response, name):
+        response.delete_cookie(name, domain=self.get_cookie_domain(app), path=self.get_cookie_path(app),
+                               secure=self.get_cookie_secure(app),
+                               samesite=self.get_cookie_samesite(app),
+                               httponly=self.get_cookie_httponly(app))
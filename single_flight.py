@@ -0,0 +1,60 @@
+"""
+Single-flight coalescing of concurrent identical reads.
+
+While a call for a key is running, other callers for the same key wait for
+its result instead of starting their own, so N concurrent vault listings for
+one user cost one query and decrypt. Nothing is cached: once the call
+returns, the next caller starts a fresh one. Writers call ``forget`` so a
+read that starts after a write never joins a flight that began before it.
+Coalescing is per process (per gunicorn worker) and only happens when a
+worker serves requests on several threads (``--threads``); a sync worker
+handles one request at a time, so it never has concurrent callers.
+"""
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``fn()``, sharing one call among concurrent callers for ``key``"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def forget(self, key):
+        """Make later callers start a new call instead of joining the current one"""
+        with self._lock:
+            self._flights.pop(key, None)
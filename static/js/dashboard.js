@@ -1,6 +1,18 @@
 // Dashboard JavaScript
 let passwords = [];
 
+// Vaults larger than this are rendered as a windowed list (see .passwords-list.virtual)
+const VIRTUAL_THRESHOLD = 200;
+const OVERSCAN_ROWS = 6;
+
+// Row elements currently in the DOM, keyed by entry ID
+const rowElements = new Map();
+let renderScheduled = false;
+
+// Folder shown in the list ('' = all); folder views are fetched with ?folder=
+let currentFolder = '';
+const knownFolders = new Set();
+
 // Prevent browser back-button access after logout
 window.addEventListener('pageshow', function(event) {
     // Check if page was loaded from cache (back/forward button)
@@ -39,6 +51,15 @@ document.addEventListener('DOMContentLoaded', function() {
     // Form submit
     document.getElementById('password-form').addEventListener('submit', handleFormSubmit);
     
+    // Folder filter
+    document.getElementById('folder-filter').addEventListener('change', function(e) {
+        currentFolder = e.target.value;
+        loadPasswords();
+    });
+    
+    // Windowed list: render the rows that scrolled into view
+    document.getElementById('passwords-list').addEventListener('scroll', scheduleRender);
+    
     // Close modal on outside click
     document.getElementById('password-modal').addEventListener('click', function(e) {
         if (e.target.id === 'password-modal') {
@@ -47,10 +68,10 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
-// Check authentication status
+// Check authentication status (session only; the vault is loaded by loadPasswords)
 async function checkAuthentication() {
     try {
-        const response = await fetch('/api/passwords');
+        const response = await fetch('/api/session');
         if (response.status === 401) {
             // Not authenticated, redirect to login
             window.location.href = '/login';
@@ -66,9 +87,11 @@ async function loadPasswords() {
     const passwordsList = document.getElementById('passwords-list');
     
     try {
+        rowElements.clear();
         passwordsList.innerHTML = '<div class="loading">Loading passwords...</div>';
         
-        const response = await fetch('/api/passwords');
+        const url = currentFolder ? `/api/passwords?folder=${encodeURIComponent(currentFolder)}` : '/api/passwords';
+        const response = await fetch(url);
         
         if (!response.ok) {
             const error = await response.json();
@@ -77,18 +100,14 @@ async function loadPasswords() {
         
         const data = await response.json();
         passwords = data.passwords || [];
-        
-        if (passwords.length === 0) {
-            passwordsList.innerHTML = `
-                <div class="empty-state">
-                    <h3>No passwords stored yet</h3>
-                    <p>Click "Add New Password" to get started</p>
-                </div>
-            `;
-        } else {
-            renderPasswords();
+        if (!currentFolder) {
+            knownFolders.clear();
         }
+        passwords.forEach(p => rememberFolder(p.folder));
+        renderFolderOptions();
+        renderPasswords();
     } catch (error) {
+        rowElements.clear();
         passwordsList.innerHTML = `
             <div class="error-message">
                 <h3>Error loading passwords</h3>
@@ -100,62 +119,249 @@ async function loadPasswords() {
 }
 
 // Render Passwords
+// Reconciles the rows in view with `passwords`: rows are reused by entry ID and
+// only rebuilt when their entry object was replaced, so a mutation touches one row
 function renderPasswords() {
     const passwordsList = document.getElementById('passwords-list');
     
-    passwordsList.innerHTML = passwords.map(password => `
-        <div class="password-item">
-            <div class="password-item-info">
-                <h3>${escapeHtml(password.website)}</h3>
-                ${password.username ? `<p><strong>Username:</strong> ${escapeHtml(password.username)}</p>` : ''}
-                <p><strong>Password:</strong> 
-                    <span class="password-value" id="pwd-${password.id}">••••••••</span>
-                    <button class="btn-show-password" onclick="togglePassword('${password.id}', '${escapeHtml(password.password)}')">Show</button>
-                </p>
-                ${password.notes ? `<p><strong>Notes:</strong> ${escapeHtml(password.notes)}</p>` : ''}
+    if (passwords.length === 0) {
+        rowElements.clear();
+        passwordsList.classList.remove('virtual');
+        passwordsList.innerHTML = currentFolder ? `
+            <div class="empty-state">
+                <h3>No passwords in ${escapeHtml(currentFolder)}</h3>
+                <p>Choose "All folders" to see the rest of your vault</p>
             </div>
-            <div class="password-item-actions">
-                <button class="btn btn-primary btn-small" onclick="editPassword('${password.id}')">Edit</button>
-                <button class="btn btn-danger btn-small" onclick="deletePassword('${password.id}')">Delete</button>
+        ` : `
+            <div class="empty-state">
+                <h3>No passwords stored yet</h3>
+                <p>Click "Add New Password" to get started</p>
             </div>
+        `;
+        return;
+    }
+    
+    let layer = passwordsList.querySelector('.password-rows');
+    if (!layer) {
+        rowElements.clear();
+        passwordsList.innerHTML = '<div class="password-rows"></div>';
+        layer = passwordsList.querySelector('.password-rows');
+    }
+    
+    const virtual = passwords.length > VIRTUAL_THRESHOLD;
+    passwordsList.classList.toggle('virtual', virtual);
+    
+    let start = 0;
+    let end = passwords.length;
+    let rowHeight = 0;
+    if (virtual) {
+        rowHeight = parseFloat(getComputedStyle(passwordsList).getPropertyValue('--row-height')) || 170;
+        layer.style.height = `${passwords.length * rowHeight}px`;
+        start = Math.max(0, Math.floor(passwordsList.scrollTop / rowHeight) - OVERSCAN_ROWS);
+        end = Math.min(passwords.length,
+                       Math.ceil((passwordsList.scrollTop + passwordsList.clientHeight) / rowHeight) + OVERSCAN_ROWS);
+    } else {
+        layer.style.height = '';
+    }
+    
+    const visible = new Set();
+    let previous = null;
+    for (let i = start; i < end; i++) {
+        const password = passwords[i];
+        visible.add(password.id);
+        
+        let row = rowElements.get(password.id);
+        if (!row) {
+            row = document.createElement('div');
+            row.className = 'password-item';
+            rowElements.set(password.id, row);
+        }
+        if (row.entry !== password) {
+            fillRow(row, password);
+        }
+        row.style.transform = virtual ? `translateY(${i * rowHeight}px)` : '';
+        
+        // Keep DOM order in step with the array without moving rows that are already in place
+        const expected = previous ? previous.nextSibling : layer.firstChild;
+        if (row !== expected) {
+            layer.insertBefore(row, expected);
+        }
+        previous = row;
+    }
+    
+    for (const [id, row] of rowElements) {
+        if (!visible.has(id)) {
+            row.remove();
+            rowElements.delete(id);
+        }
+    }
+}
+
+function fillRow(row, password) {
+    row.entry = password;
+    row.innerHTML = `
+        <div class="password-item-info">
+            <h3>${escapeHtml(password.website)}${password.folder ? `<span class="entry-folder">${escapeHtml(password.folder)}</span>` : ''}${(password.tags || []).map(tag => `<span class="entry-tag">${escapeHtml(tag)}</span>`).join('')}</h3>
+            ${password.username ? `<p><strong>Username:</strong> ${escapeHtml(password.username)}</p>` : ''}
+            <p><strong>Password:</strong> 
+                <span class="password-value" id="pwd-${password.id}">••••••••</span>
+                <button class="btn-show-password" onclick="togglePassword('${password.id}', this)">Show</button>
+            </p>
+            <p id="notes-${password.id}" style="display: none;"></p>
         </div>
-    `).join('');
+        <div class="password-item-actions">
+            <button class="btn btn-primary btn-small" onclick="editPassword('${password.id}')">Edit</button>
+            <button class="btn btn-danger btn-small" onclick="deletePassword('${password.id}')">Delete</button>
+        </div>
+    `;
+}
+
+function scheduleRender() {
+    if (renderScheduled || passwords.length <= VIRTUAL_THRESHOLD) {
+        return;
+    }
+    renderScheduled = true;
+    requestAnimationFrame(function() {
+        renderScheduled = false;
+        renderPasswords();
+    });
+}
+
+function rememberFolder(folder) {
+    if (folder) {
+        knownFolders.add(folder);
+    }
+}
+
+// Folder filter and the form's suggestions, from the folders seen so far
+function renderFolderOptions() {
+    const folders = [...knownFolders].sort((a, b) => a.localeCompare(b));
+    const filter = document.getElementById('folder-filter');
+    filter.replaceChildren(folderOption('', 'All folders'), ...folders.map(folder => folderOption(folder, folder)));
+    filter.value = currentFolder;
+    document.getElementById('folder-options').replaceChildren(...folders.map(folder => folderOption(folder)));
+}
+
+// Built as elements, not markup: folder names are user input and end up in attributes
+function folderOption(value, label) {
+    const option = document.createElement('option');
+    option.value = value;
+    if (label !== undefined) {
+        option.textContent = label;
+    }
+    return option;
+}
+
+// Apply a saved entry from the API to local state without reloading the vault
+function upsertPassword(password) {
+    rememberFolder(password.folder);
+    renderFolderOptions();
+    if (currentFolder && password.folder !== currentFolder) {
+        // Saved into (or moved to) another folder: it leaves this view
+        removePassword(password.id);
+        return;
+    }
+    
+    const index = passwords.findIndex(p => p.id === password.id);
+    if (index === -1) {
+        passwords.push(password);
+    } else {
+        passwords[index] = password;
+    }
+    renderPasswords();
+    
+    if (index === -1) {
+        // New entries are appended: bring the new row into view
+        const passwordsList = document.getElementById('passwords-list');
+        if (passwordsList.classList.contains('virtual')) {
+            passwordsList.scrollTop = passwordsList.scrollHeight;
+        } else {
+            rowElements.get(password.id).scrollIntoView({block: 'nearest'});
+        }
+    }
+}
+
+function removePassword(passwordId) {
+    passwords = passwords.filter(p => p.id !== passwordId);
+    renderPasswords();
+}
+
+// Fetch a single decrypted password (and its notes) on demand
+async function fetchSecret(id) {
+    const response = await fetch(`/api/passwords/${encodeURIComponent(id)}/secret`);
+    
+    if (response.status === 401) {
+        window.location.href = '/login';
+        throw new Error('Not authenticated');
+    }
+    
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.error || 'Failed to load password');
+    }
+    
+    return response.json();
 }
 
 // Toggle Password Visibility
-function togglePassword(id, password) {
+async function togglePassword(id, button) {
     const pwdElement = document.getElementById(`pwd-${id}`);
-    const button = event.target;
+    const notesElement = document.getElementById(`notes-${id}`);
     
-    if (pwdElement.textContent === '••••••••') {
-        pwdElement.textContent = password;
-        button.textContent = 'Hide';
+    if (button.textContent === 'Show') {
+        try {
+            button.disabled = true;
+            const secret = await fetchSecret(id);
+            pwdElement.textContent = secret.password;
+            if (secret.notes) {
+                notesElement.innerHTML = `<strong>Notes:</strong> ${escapeHtml(secret.notes)}`;
+                notesElement.style.display = '';
+            }
+            button.textContent = 'Hide';
+        } catch (error) {
+            alert('Error: ' + error.message);
+        } finally {
+            button.disabled = false;
+        }
     } else {
+        // Drop the plaintext from the page again
         pwdElement.textContent = '••••••••';
+        notesElement.textContent = '';
+        notesElement.style.display = 'none';
         button.textContent = 'Show';
     }
 }
 
 // Open Modal
-function openModal(passwordId = null) {
+async function openModal(passwordId = null) {
     const modal = document.getElementById('password-modal');
     const form = document.getElementById('password-form');
     const title = document.getElementById('modal-title');
     
-    if (passwordId) {
+    if (typeof passwordId === 'string' && passwordId) {
         title.textContent = 'Edit Password';
         const password = passwords.find(p => p.id === passwordId);
         if (password) {
+            let secret;
+            try {
+                secret = await fetchSecret(passwordId);
+            } catch (error) {
+                alert('Error: ' + error.message);
+                return;
+            }
             document.getElementById('password-id').value = password.id;
             document.getElementById('website').value = password.website;
             document.getElementById('username').value = password.username || '';
-            document.getElementById('password').value = password.password;
-            document.getElementById('notes').value = password.notes || '';
+            document.getElementById('password').value = secret.password;
+            document.getElementById('notes').value = secret.notes || '';
+            document.getElementById('folder').value = password.folder || '';
+            document.getElementById('tags').value = (password.tags || []).join(', ');
         }
     } else {
         title.textContent = 'Add Password';
         form.reset();
         document.getElementById('password-id').value = '';
+        document.getElementById('folder').value = currentFolder;
     }
     
     modal.style.display = 'flex';
@@ -177,8 +383,13 @@ async function handleFormSubmit(e) {
         website: document.getElementById('website').value,
         username: document.getElementById('username').value,
         password: document.getElementById('password').value,
-        notes: document.getElementById('notes').value
+        notes: document.getElementById('notes').value,
+        tags: document.getElementById('tags').value.split(',').map(tag => tag.trim()).filter(Boolean)
     };
+    const folder = document.getElementById('folder').value.trim();
+    if (!passwordId) {
+        data.folder = folder;
+    }
     
     if (!data.website || !data.password) {
         alert('Website and password are required');
@@ -203,9 +414,37 @@ async function handleFormSubmit(e) {
             throw new Error(error.error || 'Failed to save password');
         }
         
+        let result = await response.json();
+        
+        // Folder changes on edit go through the move endpoint (one conditional update)
+        const existing = passwordId ? passwords.find(p => p.id === passwordId) : null;
+        if (existing && (existing.folder || '') !== folder) {
+            const moveResponse = await fetch(`/api/passwords/${passwordId}/folder`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': window.csrfToken || ''
+                },
+                body: JSON.stringify({folder: folder})
+            });
+            if (!moveResponse.ok) {
+                const error = await moveResponse.json();
+                throw new Error(error.error || 'Saved, but failed to move password');
+            }
+            result = {...result, password: (await moveResponse.json()).password};
+        }
+        
         closeModal();
-        await loadPasswords();
-        alert('Password saved successfully!');
+        if (result.password) {
+            upsertPassword(result.password);
+        } else {
+            await loadPasswords();
+        }
+        if (result.breached) {
+            alert('Password saved, but it appears in a known data breach. Consider changing it on that site.');
+        } else {
+            alert('Password saved successfully!');
+        }
     } catch (error) {
         alert('Error: ' + error.message);
     }
@@ -235,7 +474,7 @@ async function deletePassword(passwordId) {
             throw new Error(error.error || 'Failed to delete password');
         }
         
-        await loadPasswords();
+        removePassword(passwordId);
         alert('Password deleted successfully!');
     } catch (error) {
         alert('Error: ' + error.message);
@@ -0,0 +1,16 @@
+"""
+Shared fixtures
+"""
+import pytest
+
+from audit import AuditLog
+from tests.fake_dynamodb import FakeTable
+
+
+@pytest.fixture
+def fake_audit_log(monkeypatch, tmp_path):
+    """Route audit events to an in-memory table instead of DynamoDB"""
+    import app as app_module  # imported lazily so test modules set their environment first
+    log = AuditLog(FakeTable('user_id', 'event_id'), str(tmp_path / 'spool'))
+    monkeypatch.setattr(app_module, 'audit_log', log)
+    return log
@@ -0,0 +1,181 @@
+"""
+Minimal in-memory stand-in for a boto3 DynamoDB Table.
+
+Supports the calls the app makes (get/put/update/delete item, query with
+Key conditions, batch_writer) and the simple condition expressions used
+for optimistic writes. Enough for unit tests, not a DynamoDB emulator.
+"""
+import copy
+import re
+
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+
+
+def _conditional_check_failed():
+    return ClientError({'Error': {'Code': 'ConditionalCheckFailedException',
+                                  'Message': 'The conditional request failed'}}, 'PutItem')
+
+
+def _store_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return Binary(bytes(value))
+    if isinstance(value, dict):
+        return {k: _store_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_store_value(v) for v in value]
+    return value
+
+
+def _matches(condition, item):
+    expression = condition.get_expression()
+    operator = expression['operator']
+    values = expression['values']
+    if operator == 'AND':
+        return all(_matches(value, item) for value in values)
+    if operator == 'attribute_exists':
+        return values[0].name in item
+    name, operand = values[0].name, values[1]
+    if name not in item:
+        return False
+    if operator == '=':
+        return item[name] == operand
+    if operator == 'begins_with':
+        return str(item[name]).startswith(operand)
+    raise NotImplementedError(operator)
+
+
+def _project(item, projection, names):
+    if not projection:
+        return item
+    fields = [names.get(field.strip(), field.strip()) for field in projection.split(',')]
+    return {field: item[field] for field in fields if field in item}
+
+
+class FakeTable:
+    def __init__(self, hash_key, range_key=None, name='FakeTable'):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.name = name
+        self.items = {}
+        self.calls = []
+
+    def _key(self, item):
+        return (item[self.hash_key], item.get(self.range_key) if self.range_key else None)
+
+    def _check(self, existing, condition, values, names):
+        if not condition:
+            return
+        for clause in condition.split(' AND '):
+            clause = clause.strip()
+            match = re.fullmatch(r'attribute_not_exists\((.+)\)', clause)
+            if match:
+                if existing is not None and names.get(match.group(1), match.group(1)) in existing:
+                    raise _conditional_check_failed()
+                continue
+            match = re.fullmatch(r'attribute_exists\((.+)\)', clause)
+            if match:
+                if existing is None or names.get(match.group(1), match.group(1)) not in existing:
+                    raise _conditional_check_failed()
+                continue
+            match = re.fullmatch(r'(\S+) = (:\w+)', clause)
+            if match:
+                field = names.get(match.group(1), match.group(1))
+                if existing is None or existing.get(field) != values[match.group(2)]:
+                    raise _conditional_check_failed()
+                continue
+            raise NotImplementedError(clause)
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.calls.append(('get_item', Key))
+        item = self.items.get(self._key(Key))
+        if item is None:
+            return {}
+        return {'Item': copy.deepcopy(_project(item, ProjectionExpression, ExpressionAttributeNames or {}))}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None,
+                 ExpressionAttributeNames=None, **kwargs):
+        self.calls.append(('put_item', self._key(Item)))
+        self._check(self.items.get(self._key(Item)), ConditionExpression,
+                    ExpressionAttributeValues or {}, ExpressionAttributeNames or {})
+        self.items[self._key(Item)] = _store_value(copy.deepcopy(Item))
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, **kwargs):
+        self.calls.append(('delete_item', self._key(Key)))
+        self._check(self.items.get(self._key(Key)), ConditionExpression,
+                    ExpressionAttributeValues or {}, ExpressionAttributeNames or {})
+        self.items.pop(self._key(Key), None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, ReturnValues=None, **kwargs):
+        self.calls.append(('update_item', self._key(Key)))
+        values = ExpressionAttributeValues or {}
+        names = ExpressionAttributeNames or {}
+        existing = self.items.get(self._key(Key))
+        self._check(existing, ConditionExpression, values, names)
+        item = copy.deepcopy(existing) if existing else dict(Key)
+        for section in re.split(r'\s(?=SET |REMOVE )', UpdateExpression.strip()):
+            action, _, body = section.partition(' ')
+            for part in body.split(','):
+                part = part.strip()
+                if action == 'SET':
+                    field, _, value = part.partition('=')
+                    target, field = self._resolve(item, field.strip(), names)
+                    value = value.strip()
+                    plus = re.fullmatch(r'(\S+) \+ (:\w+)', value)
+                    if plus:
+                        target[field] = target.get(names.get(plus.group(1), plus.group(1)), 0) + values[plus.group(2)]
+                    else:
+                        target[field] = _store_value(values[value])
+                elif action == 'REMOVE':
+                    target, field = self._resolve(item, part, names)
+                    target.pop(field, None)
+        self.items[self._key(Key)] = item
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': copy.deepcopy(item)}
+        return {}
+
+    def _resolve(self, item, path, names):
+        # 'a.#b' -> (item['a'], names['#b'])
+        segments = [names.get(segment, segment) for segment in path.split('.')]
+        target = item
+        for segment in segments[:-1]:
+            target = target[segment]
+        return target, segments[-1]
+
+    def query(self, KeyConditionExpression, ProjectionExpression=None, ExpressionAttributeNames=None,
+              IndexName=None, ScanIndexForward=True, Limit=None, FilterExpression=None, **kwargs):
+        self.calls.append(('query', IndexName))
+        names = ExpressionAttributeNames or {}
+        matched = [item for _, item in sorted(self.items.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1])),
+                                              reverse=not ScanIndexForward)
+                   if _matches(KeyConditionExpression, item)]
+        if Limit is not None:
+            matched = matched[:Limit]
+        if FilterExpression is not None:
+            # Applied after Limit, as DynamoDB does
+            matched = [item for item in matched if _matches(FilterExpression, item)]
+        return {'Items': [copy.deepcopy(_project(item, ProjectionExpression, names)) for item in matched]}
+
+    def batch_writer(self):
+        return _BatchWriter(self)
+
+
+class _BatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self.table.delete_item(Key=Key)
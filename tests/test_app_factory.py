@@ -0,0 +1,115 @@
+"""
+Tests for the application factory
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import app AFTER setting environment variables
+from app import create_app
+from tests.fake_dynamodb import FakeTable
+
+
+def make_app(tmp_path, **config):
+    tables = {
+        'users': FakeTable('username'),
+        'passwords': FakeTable('user_id', 'password_id'),
+        'audit': FakeTable('user_id', 'event_id'),
+    }
+    config = {'TESTING': True, 'WTF_CSRF_ENABLED': False,
+              'AUDIT_SPOOL_FILE': str(tmp_path / 'spool'), **config}
+    return create_app(config, tables=tables), tables
+
+
+def test_no_aws_clients_until_used(tmp_path):
+    """Test that creating an app and serving requests without DynamoDB creates no boto3 client"""
+    app, _ = make_app(tmp_path)
+    app.test_client().get('/health')
+    dynamodb = app.extensions['password_manager'].dynamodb
+    assert dynamodb._resources_created == 0
+    assert dynamodb._client is None
+
+
+def test_boto3_resources_are_per_thread(tmp_path):
+    """Test that each thread gets its own boto3 resource, since resources aren't thread-safe"""
+    import threading
+    app, _ = make_app(tmp_path)
+    dynamodb = app.extensions['password_manager'].dynamodb
+    resources = [dynamodb._get_resource()]
+    worker = threading.Thread(target=lambda: resources.append(dynamodb._get_resource()))
+    worker.start()
+    worker.join()
+    assert dynamodb._get_resource() is resources[0]
+    assert resources[1] is not resources[0]
+    assert dynamodb._resources_created == 2
+
+
+def test_injected_tables_are_used(tmp_path):
+    """Test that routes read the tables passed to create_app"""
+    app, tables = make_app(tmp_path)
+    tables['passwords'].put_item(Item={'user_id': 'u1', 'password_id': 'p1', 'website': 'example.com',
+                                       'username': 'me', 'created_at': '2024-01-01',
+                                       'encrypted_password': 'ciphertext'})
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 'u1'
+            sess['user_password'] = 'pw'
+        response = client.get('/api/passwords')
+    assert [entry['website'] for entry in response.get_json()['passwords']] == ['example.com']
+
+
+def test_instances_are_independent(tmp_path):
+    """Test that two apps in one process keep their own config and state"""
+    first, first_tables = make_app(tmp_path, LOGIN_RATE_LIMIT_USER='1/300')
+    second, second_tables = make_app(tmp_path)
+    assert first.extensions['password_manager'].login_user_limiter is not \
+        second.extensions['password_manager'].login_user_limiter
+
+    for app in (first, second):
+        app.test_client().post('/login', data={'username': 'alice', 'password': 'pw'})
+    assert first.test_client().post('/login', data={'username': 'alice', 'password': 'pw'}).status_code == 429
+    assert second.test_client().post('/login', data={'username': 'alice', 'password': 'pw'}).status_code == 200
+    assert first_tables['users'].calls and second_tables['users'].calls
+
+
+def test_breach_index_is_per_app(tmp_path):
+    """Test that each app opens its own BREACHED_PASSWORDS_FILE"""
+    import hashlib
+    from app import is_breached_password
+    from breach_check import build_index
+    path = str(tmp_path / 'breached.idx')
+    build_index([hashlib.sha1(b'letmein123').hexdigest() + ':5\n'], path)
+    checked, _ = make_app(tmp_path, BREACHED_PASSWORDS_FILE=path)
+    unchecked, _ = make_app(tmp_path, BREACHED_PASSWORDS_FILE=str(tmp_path / 'missing.idx'))
+    with checked.app_context():
+        assert is_breached_password('letmein123')
+    with unchecked.app_context():
+        assert not is_breached_password('letmein123')
+    assert unchecked.extensions['password_manager'].breach_index is False
+
+
+def test_secret_key_required(tmp_path):
+    """Test that an app without SECRET_KEY is refused"""
+    with pytest.raises(ValueError):
+        create_app({'SECRET_KEY': ''})
+
+
+def test_recovery_wrap_secret_required_in_production(tmp_path, monkeypatch):
+    """Test that production refuses to fall back to SECRET_KEY for recovery wraps"""
+    monkeypatch.setenv('FLASK_ENV', 'production')
+    monkeypatch.delenv('RECOVERY_WRAP_SECRET', raising=False)
+    with pytest.raises(ValueError):
+        make_app(tmp_path)
+    app, _ = make_app(tmp_path, RECOVERY_WRAP_SECRET='separate-secret')
+    assert app.config['RECOVERY_WRAP_SECRET'] == 'separate-secret'
@@ -0,0 +1,69 @@
+"""
+Test cases for fingerprinted static assets
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from assets import build_manifest, fingerprint_name
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    
+    with app.test_client() as client:
+        yield client
+
+
+def test_fingerprint_name():
+    """Test that the digest is inserted before the extension"""
+    assert fingerprint_name('css/style.css', 'abc123') == 'css/style.abc123.css'
+
+
+def test_manifest_changes_with_content(tmp_path):
+    """Test that editing a file changes its fingerprinted name"""
+    (tmp_path / 'app.js').write_text('console.log(1);')
+    first = build_manifest(str(tmp_path))['app.js']
+    (tmp_path / 'app.js').write_text('console.log(2);')
+    second = build_manifest(str(tmp_path))['app.js']
+    assert first != second
+    assert first.startswith('app.') and first.endswith('.js')
+
+
+def test_templates_use_fingerprinted_urls(client):
+    """Test that pages link to hashed asset URLs"""
+    hashed = app.extensions['asset_manifest'].files['css/style.css']
+    response = client.get('/')
+    assert f'/static/{hashed}'.encode() in response.data
+
+
+def test_fingerprinted_asset_is_immutable(client):
+    """Test that hashed URLs are served with a long immutable cache lifetime"""
+    hashed = app.extensions['asset_manifest'].files['css/style.css']
+    response = client.get(f'/static/{hashed}')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    response.close()
+
+
+def test_plain_static_url_still_served(client):
+    """Test that unhashed URLs keep working and are revalidated"""
+    response = client.get('/static/css/style.css')
+    assert response.status_code == 200
+    assert 'immutable' not in response.headers.get('Cache-Control', '')
+    response.close()
@@ -0,0 +1,174 @@
+"""
+Tests for the asynchronous audit log
+"""
+import pytest
+import os
+import sys
+import json
+import time
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from botocore.exceptions import EndpointConnectionError
+
+# Import app AFTER setting environment variables
+import app as app_module
+from app import app, hash_password
+from audit import BATCH_SIZE, AuditLog
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+
+
+class UnreachableTable(FakeTable):
+    def batch_writer(self):
+        raise EndpointConnectionError(endpoint_url='https://dynamodb.us-east-1.amazonaws.com')
+
+
+class FlakyTable(UnreachableTable):
+    down = True
+
+    def batch_writer(self):
+        if self.down:
+            return super().batch_writer()
+        return FakeTable.batch_writer(self)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def table():
+    return FakeTable('user_id', 'event_id', name='Audit')
+
+
+@pytest.fixture
+def audit_log(table, tmp_path, monkeypatch):
+    log = AuditLog(table, str(tmp_path / 'audit-spool.jsonl'))
+    monkeypatch.setattr(app_module, 'audit_log', log)
+    return log
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+
+    with app.test_client() as client:
+        yield client
+
+
+def test_record_is_flushed_on_close(audit_log, table):
+    """Queued events reach the table with a TTL once the log is closed"""
+    audit_log.record('login', USER_ID, ip='203.0.113.5')
+    audit_log.record('vault_add', USER_ID, password_id='p1')
+    audit_log.close()
+
+    events = sorted(table.items.values(), key=lambda item: item['event_id'])
+    assert [event['event'] for event in events] == ['login', 'vault_add']
+    assert events[0]['ip'] == '203.0.113.5'
+    assert events[1]['details'] == {'password_id': 'p1'}
+    assert events[0]['expires_at'] > 0
+
+
+def test_batches_are_capped():
+    """One flush never takes more items than a BatchWriteItem accepts"""
+    log = AuditLog(FakeTable('user_id', 'event_id'), 'unused')
+    for i in range(BATCH_SIZE + 5):
+        log._queue.put_nowait({'user_id': USER_ID, 'event_id': str(i)})
+    assert len(log._take(timeout=None)) == BATCH_SIZE
+    assert len(log._take(timeout=None)) == 5
+
+
+def test_full_queue_drops_without_raising(table, tmp_path):
+    """Recording never blocks the request when the queue is full"""
+    log = AuditLog(table, str(tmp_path / 'spool'), max_queue=1)
+    log.start = lambda: None  # keep the writer from draining the queue
+    log.record('login', USER_ID)
+    log.record('login', USER_ID)
+    assert log.dropped == 1
+
+
+def test_failed_flush_spools_and_replays(table, tmp_path):
+    """Events that can't be written are spooled and replayed on the next start"""
+    spool = tmp_path / 'audit-spool.jsonl'
+    failing = AuditLog(UnreachableTable('user_id', 'event_id'), str(spool))
+    failing.start = lambda: None
+    failing.record('password_reset', USER_ID)
+    failing.close()
+    assert json.loads(spool.read_text())['event'] == 'password_reset'
+
+    healthy = AuditLog(table, str(spool))
+    healthy._replay_spool()
+    assert [item['event'] for item in table.items.values()] == ['password_reset']
+    assert not spool.exists()
+
+
+def test_audit_endpoint_returns_recent_events(client, audit_log):
+    """The API lists the signed-in user's events, newest first"""
+    for event in ('login', 'vault_add', 'logout'):
+        audit_log.record(event, USER_ID)
+    audit_log.record('login', 'someone-else')
+    audit_log.close()
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = USER_ID
+    response = client.get('/api/audit?limit=2')
+    assert response.status_code == 200
+    assert [event['event'] for event in response.get_json()['events']] == ['logout', 'vault_add']
+
+
+def test_audit_endpoint_requires_login(client, audit_log):
+    """Test that the audit API needs a session"""
+    assert client.get('/api/audit').status_code == 401
+
+
+def test_failed_login_is_audited(client, audit_log, table, monkeypatch):
+    """A wrong password is recorded against the account"""
+    users = FakeTable('username')
+    users.put_item(Item={'username': 'alice', 'user_id': USER_ID, 'password_hash': hash_password('right-password')})
+    monkeypatch.setattr(app_module, 'users_table', users)
+
+    client.post('/login', data={'username': 'alice', 'password': 'wrong-password'})
+    audit_log.close()
+    assert [item['event'] for item in table.items.values()] == ['login_failed']
+
+
+def test_spool_is_capped(tmp_path):
+    """Events beyond the spool size limit are dropped and counted"""
+    spool = tmp_path / 'audit-spool.jsonl'
+    log = AuditLog(UnreachableTable('user_id', 'event_id'), str(spool), max_spool_bytes=1)
+    log._flush([{'user_id': USER_ID, 'event_id': '1'}])
+    log._flush([{'user_id': USER_ID, 'event_id': '2'}, {'user_id': USER_ID, 'event_id': '3'}])
+    assert len(spool.read_text().splitlines()) == 1
+    assert log.dropped == 2
+
+
+def test_spool_replays_after_next_successful_flush(tmp_path):
+    """A running writer drains the spool once DynamoDB accepts writes again"""
+    flaky = FlakyTable('user_id', 'event_id')
+    log = AuditLog(flaky, str(tmp_path / 'audit-spool.jsonl'), flush_interval=0.01)
+    log.record('login', USER_ID)
+    wait_for(lambda: os.path.exists(log.spool_path))
+
+    flaky.down = False
+    log.record('logout', USER_ID)
+    wait_for(lambda: len(flaky.items) == 2)
+    log.close()
+    assert sorted(item['event'] for item in flaky.items.values()) == ['login', 'logout']
+    assert not os.path.exists(log.spool_path)
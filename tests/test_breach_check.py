@@ -0,0 +1,78 @@
+"""
+Test cases for the offline breached password index
+"""
+import hashlib
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path to import breach_check
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import breach_check
+from breach_check import BreachIndex, build_index, password_digest
+
+
+BREACHED = ['password', '123456', 'qwerty', 'letmein', 'dragon']
+
+
+def sha1_dump(passwords):
+    return [f"{hashlib.sha1(p.encode()).hexdigest().upper()}:42\n" for p in passwords]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / 'breached.idx')
+    assert build_index(sha1_dump(BREACHED) + sha1_dump(['password']), path) == len(BREACHED)
+    return path
+
+
+def test_lookup_finds_breached_passwords(index_path):
+    """Test that every password in the dump is found"""
+    index = BreachIndex(index_path)
+    for password in BREACHED:
+        assert index.is_breached(password)
+    assert not index.is_breached('correct horse battery staple')
+    index.close()
+
+
+def test_external_sort_merges_runs(tmp_path, monkeypatch):
+    """Test that unsorted dumps bigger than one sort chunk are merged correctly"""
+    monkeypatch.setattr(breach_check, 'SORT_CHUNK_RECORDS', 2)
+    path = str(tmp_path / 'breached.idx')
+    build_index(reversed(sha1_dump(BREACHED)), path)
+    index = BreachIndex(path)
+    assert index.count == len(BREACHED)
+    assert all(index.is_breached(password) for password in BREACHED)
+    index.close()
+
+
+def test_ntlm_plaintext_index(tmp_path):
+    """Test NTLM hashing and building from a plaintext list"""
+    assert password_digest('password', 'ntlm').hex() == '8846f7eaee8fb117ad06bdd830b7586c'
+    path = str(tmp_path / 'ntlm.idx')
+    build_index(['hunter2\n'], path, algorithm='ntlm', plaintext=True)
+    index = BreachIndex(path)
+    assert index.algorithm == 'ntlm'
+    assert index.is_breached('hunter2')
+    index.close()
+
+
+def test_rejects_other_files(tmp_path):
+    """Test that a file without the index header is refused"""
+    path = tmp_path / 'not-an-index'
+    path.write_bytes(b'x' * (breach_check.HEADER.size + breach_check.OFFSETS.size))
+    with pytest.raises(ValueError):
+        BreachIndex(str(path))
+
+
+def test_cli_build_and_check(tmp_path, capsys):
+    """Test the build and check commands"""
+    dump = tmp_path / 'dump.txt'
+    dump.write_text(''.join(sha1_dump(BREACHED)))
+    path = str(tmp_path / 'breached.idx')
+    assert breach_check.main(['build', str(dump), path]) == 0
+    assert breach_check.main(['check', path, 'qwerty']) == 1
+    assert breach_check.main(['check', path, 'not-in-the-dump']) == 0
+    assert 'not found' in capsys.readouterr().out
@@ -0,0 +1,82 @@
+"""
+Test cases for gzip/brotli response compression
+"""
+import gzip
+import os
+import sys
+
+import pytest
+from flask import Flask, Response, jsonify
+
+# Add parent directory to path to import compression
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import compression
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    compression.init_app(app)
+
+    @app.route('/big')
+    def big():
+        return jsonify({'passwords': [{'website': 'example.com', 'notes': 'n' * 50}] * 50})
+
+    @app.route('/tiny')
+    def tiny():
+        return jsonify({'ok': True})
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'line {i}\n' for i in range(100)), mimetype='text/plain')
+
+    with app.test_client() as client:
+        yield client
+
+
+def test_gzip_large_json(client):
+    """Large JSON is gzip compressed when the client accepts gzip"""
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'example.com' in gzip.decompress(response.data)
+
+
+def test_brotli_preferred_when_available(client):
+    """Brotli wins over gzip when both are accepted"""
+    if compression.brotli is None:
+        pytest.skip('brotli not installed')
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert b'example.com' in compression.brotli.decompress(response.data)
+
+
+def test_tiny_payload_not_compressed(client):
+    """Responses under the size threshold are left alone"""
+    response = client.get('/tiny', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_no_accept_encoding(client):
+    """Clients that don't accept compression get identity"""
+    response = client.get('/big', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_streamed_response_compressed(client):
+    """Streamed responses are compressed chunk by chunk"""
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data).startswith(b'line 0\nline 1\n')
+
+
+def test_static_file_compressed():
+    """Static files served by send_file are compressed too"""
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), '..', 'static'))
+    compression.init_app(app)
+    response = app.test_client().get('/static/css/style.css', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'{' in gzip.decompress(response.data)
+    response.close()
@@ -0,0 +1,162 @@
+"""
+Tests for the DynamoDB circuit breaker and hedged reads
+"""
+import pytest
+import os
+import sys
+import threading
+import time
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+# Import app AFTER setting environment variables
+import app as app_module
+from app import app
+from dynamo_guard import CircuitBreaker, CircuitOpenError, GuardedTable, is_failure
+from tests.fake_dynamodb import FakeTable
+
+
+def throttled():
+    return ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'slow down'}}, 'GetItem')
+
+
+class FlakyTable(FakeTable):
+    def __init__(self):
+        super().__init__('username', name='Users')
+        self.failing = True
+
+    def get_item(self, **kwargs):
+        if self.failing:
+            raise throttled()
+        return super().get_item(**kwargs)
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+
+    with app.test_client() as client:
+        yield client
+
+
+def test_only_service_errors_count_as_failures():
+    """Throttling counts against the breaker, conditional check failures don't"""
+    assert is_failure(throttled())
+    conditional = ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': ''}}, 'PutItem')
+    assert not is_failure(conditional)
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    """Breaker opens over the failure ratio, then a successful trial closes it"""
+    now = [1000.0]
+    monkeypatch.setattr('dynamo_guard.time.monotonic', lambda: now[0])
+    table = FlakyTable()
+    guarded = GuardedTable(table, CircuitBreaker('Users', min_calls=4, open_seconds=10))
+
+    for _ in range(4):
+        with pytest.raises(ClientError):
+            guarded.get_item(Key={'username': 'alice'})
+    assert guarded.breaker.state == 'open'
+
+    calls = len(table.calls)
+    with pytest.raises(CircuitOpenError) as excinfo:
+        guarded.get_item(Key={'username': 'alice'})
+    assert excinfo.value.retry_after == 10
+    assert len(table.calls) == calls
+
+    now[0] += 10
+    assert guarded.breaker.state == 'half-open'
+    table.failing = False
+    guarded.get_item(Key={'username': 'alice'})
+    assert guarded.breaker.state == 'closed'
+
+
+def test_failed_trial_reopens_breaker(monkeypatch):
+    """A failing half-open trial starts a new cool-down"""
+    now = [1000.0]
+    monkeypatch.setattr('dynamo_guard.time.monotonic', lambda: now[0])
+    guarded = GuardedTable(FlakyTable(), CircuitBreaker('Users', min_calls=2, open_seconds=5))
+    for _ in range(2):
+        with pytest.raises(ClientError):
+            guarded.get_item(Key={'username': 'alice'})
+
+    now[0] += 5
+    with pytest.raises(ClientError):
+        guarded.get_item(Key={'username': 'alice'})
+    assert guarded.breaker.state == 'open'
+
+
+def test_open_circuit_returns_503(client, monkeypatch):
+    """Routes fail fast with 503 and Retry-After while the circuit is open"""
+    guarded = GuardedTable(FlakyTable(), CircuitBreaker('Users', min_calls=1))
+    monkeypatch.setattr(app_module, 'users_table', guarded)
+    with pytest.raises(ClientError):
+        guarded.get_item(Key={'username': 'alice'})
+
+    response = client.post('/login', data={'username': 'alice', 'password': 'pw', 'totp_token': '123456'})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_hedged_read_returns_faster_response():
+    """A slow first read is hedged and the second, faster answer wins"""
+    table = FakeTable('username', name='Users')
+    table.items[('alice', None)] = {'username': 'alice'}
+    calls = []
+    release = threading.Event()
+    original = table.get_item
+
+    def get_item(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            release.wait(2)
+        return original(**kwargs)
+
+    table.get_item = get_item
+    guarded = GuardedTable(table, CircuitBreaker('Users'), hedge_executor=ThreadPoolExecutor(2))
+    for _ in range(20):
+        guarded._latency['get_item'].add(0.01)
+
+    started = time.perf_counter()
+    result = guarded.get_item(Key={'username': 'alice'})
+    elapsed = time.perf_counter() - started
+    release.set()
+
+    assert result['Item']['username'] == 'alice'
+    assert len(calls) == 2
+    assert elapsed < 1
+
+
+def test_hedged_reads_resolve_the_table_in_pool_threads():
+    """Hedged calls look up the table method in the pool thread, not the request thread"""
+    table = FakeTable('username', name='Users')
+    table.items[('alice', None)] = {'username': 'alice'}
+    resolved_in = []
+
+    class PerThreadTable:
+        def __getattr__(self, name):
+            resolved_in.append(threading.current_thread().name)
+            return getattr(table, name)
+
+    guarded = GuardedTable(PerThreadTable(), CircuitBreaker('Users'),
+                           hedge_executor=ThreadPoolExecutor(2, thread_name_prefix='hedge'))
+    for _ in range(20):
+        guarded._latency['get_item'].add(0.01)
+
+    assert guarded.get_item(Key={'username': 'alice'})['Item']['username'] == 'alice'
+    assert resolved_in and all(name.startswith('hedge') for name in resolved_in)
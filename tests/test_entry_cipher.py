@@ -0,0 +1,91 @@
+"""
+Tests for the versioned entry ciphertext and its lazy migration
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from boto3.dynamodb.types import Binary
+from cryptography.fernet import Fernet
+
+# Import app AFTER setting environment variables
+import app as app_module
+from app import app, get_encryption_key
+import entry_cipher
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+LOGIN_PASSWORD = 'login-password'
+KEY = get_encryption_key(USER_ID, LOGIN_PASSWORD)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable('user_id', 'password_id')
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    return table
+
+
+@pytest.fixture
+def client():
+    """Create a logged in test client"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['user_password'] = LOGIN_PASSWORD
+        yield client
+
+
+def test_roundtrip_is_compact_binary():
+    """Test that the current format is much smaller than a Fernet token"""
+    blob = entry_cipher.encrypt('hunter22', KEY, USER_ID, 'p1')
+    assert blob[0] == entry_cipher.VERSION_AESGCM
+    assert len(blob) == 1 + 12 + len('hunter22') + 16
+    assert len(blob) < len(Fernet(KEY).encrypt(b'hunter22')) / 2
+    assert entry_cipher.decrypt(Binary(blob), KEY, USER_ID, 'p1') == 'hunter22'
+
+
+def test_ciphertext_is_bound_to_entry():
+    """Test that a value moved to another entry or user does not decrypt"""
+    blob = entry_cipher.encrypt('hunter22', KEY, USER_ID, 'p1')
+    with pytest.raises(ValueError):
+        entry_cipher.decrypt(blob, KEY, USER_ID, 'p2')
+    with pytest.raises(ValueError):
+        entry_cipher.decrypt(blob, KEY, 'user-2', 'p1')
+
+
+def test_unknown_version_rejected():
+    """Test that unsupported version bytes fail cleanly"""
+    blob = entry_cipher.encrypt('hunter22', KEY, USER_ID, 'p1')
+    with pytest.raises(ValueError):
+        entry_cipher.decrypt(b'\x07' + blob[1:], KEY, USER_ID, 'p1')
+
+
+def test_legacy_entry_upgraded_on_read(client, table):
+    """Test that a Fernet entry is served and rewritten in the new format"""
+    legacy = Fernet(KEY).encrypt(b'old-secret').decode('utf-8')
+    table.put_item(Item={'user_id': USER_ID, 'password_id': 'p1', 'website': 'x', 'encrypted_password': legacy})
+
+    response = client.get('/api/passwords/p1/secret')
+    assert response.get_json()['password'] == 'old-secret'
+
+    stored = table.items[(USER_ID, 'p1')]['encrypted_password']
+    assert isinstance(stored, Binary)
+    assert not entry_cipher.needs_upgrade(stored)
+    assert client.get('/api/passwords/p1/secret').get_json()['password'] == 'old-secret'
+    assert [call[0] for call in table.calls].count('update_item') == 1
@@ -0,0 +1,122 @@
+"""
+Test cases for envelope encryption of vault data keys
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pyotp
+
+import app as app_module
+from app import app, encrypt_password, get_encryption_key, hash_password
+from envelope import generate_data_key, password_kek, new_salt, unwrap_key, wrap_key
+from tests.fake_dynamodb import FakeTable
+
+
+@pytest.fixture
+def tables(monkeypatch, fake_audit_log):
+    users = FakeTable('username')
+    passwords = FakeTable('user_id', 'password_id')
+    monkeypatch.setattr(app_module, 'users_table', users)
+    monkeypatch.setattr(app_module, 'passwords_table', passwords)
+    return users, passwords
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    
+    with app.test_client() as client:
+        yield client
+
+
+def login(client, username, password, totp_secret=None):
+    response = client.post('/login', data={'username': username, 'password': password})
+    if totp_secret:
+        response = client.post('/login', data={'username': username, 'password': '',
+                                               'totp_token': pyotp.TOTP(totp_secret).now()})
+    return response
+
+
+def test_wrap_roundtrip():
+    """Test that a wrapped data key only unwraps with the right key"""
+    data_key = generate_data_key()
+    salt = new_salt()
+    wrapped = wrap_key(data_key, password_kek('pw', salt))
+    assert unwrap_key(wrapped, password_kek('pw', salt)) == data_key
+    with pytest.raises(ValueError):
+        unwrap_key(wrapped, password_kek('other', salt))
+
+
+def test_reset_keeps_vault_readable(client, tables):
+    """Test that a TOTP verified reset rewraps the key instead of breaking the vault"""
+    users, passwords = tables
+    totp_secret = pyotp.random_base32()
+    with client.session_transaction() as sess:
+        sess.update({'reg_username': 'alice', 'reg_email': 'a@example.com', 'reg_email_lower': 'a@example.com',
+                     'reg_password': 'Original-pw-1', 'reg_totp_secret': totp_secret})
+    assert client.get('/complete-registration').status_code == 302
+    assert 'wrapped_data_key' in users.items[('alice', None)]
+    
+    entry_id = client.post('/api/passwords', json={'website': 'example.com', 'password': 'vault-secret'}).get_json()['id']
+    encrypted_before = [item.get('encrypted_password') for item in passwords.items.values()]
+    
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess.update({'reset_username': 'alice', 'reset_user_id': users.items[('alice', None)]['user_id'],
+                     'reset_verified': True})
+    client.post('/reset-password', data={'password': 'Brand-new-pw-2', 'confirm_password': 'Brand-new-pw-2'})
+    
+    # Only the user item was written; vault items are untouched
+    assert [item.get('encrypted_password') for item in passwords.items.values()] == encrypted_before
+    
+    assert login(client, 'alice', 'Brand-new-pw-2', totp_secret).status_code == 302
+    secret = client.get(f'/api/passwords/{entry_id}/secret')
+    assert secret.get_json()['password'] == 'vault-secret'
+
+
+def test_reset_with_changed_recovery_secret_is_logged(client, tables, monkeypatch, capsys):
+    """Test that a recovery wrap made under another secret fails the reset loudly"""
+    users, _ = tables
+    with client.session_transaction() as sess:
+        sess.update({'reg_username': 'bob', 'reg_email': 'b@example.com', 'reg_email_lower': 'b@example.com',
+                     'reg_password': 'Original-pw-1', 'reg_totp_secret': pyotp.random_base32()})
+    client.get('/complete-registration')
+    monkeypatch.setitem(app.config, 'RECOVERY_WRAP_SECRET', 'rotated-secret')
+    
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess.update({'reset_username': 'bob', 'reset_user_id': users.items[('bob', None)]['user_id'],
+                     'reset_verified': True})
+    response = client.post('/reset-password', data={'password': 'Brand-new-pw-2', 'confirm_password': 'Brand-new-pw-2'})
+    
+    assert b'Failed to reset password' in response.data
+    assert 'CRITICAL: recovery wrap' in capsys.readouterr().err
+
+
+def test_legacy_user_adopts_derived_key(client, tables):
+    """Test that users without a wrapped key keep reading their existing vault"""
+    users, passwords = tables
+    users.put_item(Item={'username': 'bob', 'user_id': 'bob-id', 'password_hash': hash_password('bobs-pw'),
+                         'totp_enabled': False})
+    passwords.put_item(Item={'user_id': 'bob-id', 'password_id': 'p1', 'website': 'x',
+                             'encrypted_password': encrypt_password('old-secret', get_encryption_key('bob-id', 'bobs-pw'),
+                                                                 'bob-id', 'p1')})
+    
+    assert login(client, 'bob', 'bobs-pw').status_code == 302
+    assert 'wrapped_data_key' in users.items[('bob', None)]
+    with client.session_transaction() as sess:
+        assert 'user_password' not in sess
+    assert client.get('/api/passwords/p1/secret').get_json()['password'] == 'old-secret'
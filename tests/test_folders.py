@@ -0,0 +1,112 @@
+"""
+Tests for folders and tags on vault entries
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import app AFTER setting environment variables
+import app as app_module
+from app import FOLDER_INDEX, app, clean_tags
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+
+
+@pytest.fixture
+def table(monkeypatch, fake_audit_log):
+    table = FakeTable('user_id', 'password_id')
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    return table
+
+
+@pytest.fixture
+def client():
+    """Create a logged in test client"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['user_password'] = 'login-password'
+        yield client
+
+
+def add(client, website, **fields):
+    response = client.post('/api/passwords', json={'website': website, 'password': 'Secret-Value-42', **fields})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_folder_listing_reads_only_the_index(client, table):
+    """Test that ?folder= queries the sparse index and returns just that folder"""
+    add(client, 'bank.example', folder='Finance', tags=['money'])
+    add(client, 'mail.example', folder='Personal')
+    unfiled_id = add(client, 'news.example')
+    assert 'folder_key' not in table.items[(USER_ID, unfiled_id)]
+
+    table.calls.clear()
+    response = client.get('/api/passwords?folder=Finance')
+    assert response.status_code == 200
+    entries = response.get_json()['passwords']
+    assert [(entry['website'], entry['folder'], entry['tags']) for entry in entries] == \
+        [('bank.example', 'Finance', ['money'])]
+    assert table.calls == [('query', FOLDER_INDEX)]
+    assert len(client.get('/api/passwords').get_json()['passwords']) == 3
+
+
+def test_move_is_one_conditional_update(client, table):
+    """Test that moving rewrites folder and index key in a single update"""
+    password_id = add(client, 'bank.example', folder='Finance')
+    table.calls.clear()
+
+    response = client.put(f'/api/passwords/{password_id}/folder', json={'folder': 'Archive'})
+    assert response.status_code == 200
+    assert response.get_json()['password']['folder'] == 'Archive'
+    assert [call[0] for call in table.calls] == ['update_item']
+    assert client.get('/api/passwords?folder=Finance').get_json()['passwords'] == []
+    assert len(client.get('/api/passwords?folder=Archive').get_json()['passwords']) == 1
+
+    client.put(f'/api/passwords/{password_id}/folder', json={'folder': ''})
+    assert 'folder_key' not in table.items[(USER_ID, password_id)]
+
+
+def test_move_missing_entry_creates_nothing(client, table):
+    """Test that moving an unknown entry is a 404, not an upsert"""
+    response = client.put('/api/passwords/missing/folder', json={'folder': 'Archive'})
+    assert response.status_code == 404
+    assert table.items == {}
+
+
+def test_tags_are_cleaned_and_updated(client, table):
+    """Test that tags are trimmed, de-duplicated and editable"""
+    assert clean_tags([' work ', 'Work', '', 'vpn']) == ['work', 'vpn']
+    password_id = add(client, 'vpn.example', tags=['a'])
+    response = client.put(f'/api/passwords/{password_id}', json={'tags': ['b', 'c']})
+    assert response.get_json()['password']['tags'] == ['b', 'c']
+    assert client.post('/api/passwords', json={'website': 'x', 'password': 'y', 'tags': 'nope'}).status_code == 400
+
+
+def test_packed_vault_filters_folders(client, table, monkeypatch):
+    """Test that folders and moves work in the packed layout"""
+    monkeypatch.setitem(app.config, 'VAULT_LAYOUT', 'packed')
+    password_id = add(client, 'bank.example', folder='Finance')
+    add(client, 'news.example')
+
+    assert [entry['website'] for entry in client.get('/api/passwords?folder=Finance').get_json()['passwords']] == \
+        ['bank.example']
+    client.put(f'/api/passwords/{password_id}/folder', json={'folder': 'Archive'})
+    assert client.get('/api/passwords?folder=Finance').get_json()['passwords'] == []
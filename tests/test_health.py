@@ -46,3 +46,80 @@ def test_health_endpoint_content_type(client):
     assert response.status_code == 200
     assert 'application/json' in response.content_type
 
+
+
+class FakeDynamoDBClient:
+    def __init__(self, status='ACTIVE', error=None):
+        self.status = status
+        self.error = error
+        self.calls = 0
+
+    def describe_table(self, TableName):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {'Table': {'TableName': TableName, 'TableStatus': self.status}}
+
+
+class FakeCanaryTable:
+    def get_item(self, Key):
+        return {}
+
+
+def make_checker(client, **kwargs):
+    from readiness import ReadinessChecker
+    return ReadinessChecker(client, ['users', 'passwords'], FakeCanaryTable(), {'username': 'canary'}, **kwargs)
+
+
+def test_ready_reports_cached_result(client, monkeypatch):
+    """Test that /ready serves the cached check without calling DynamoDB"""
+    dynamo = FakeDynamoDBClient()
+    checker = make_checker(dynamo, interval=3600)
+    checker.check_now()
+    monkeypatch.setattr(checker, 'start', lambda: None)
+    monkeypatch.setattr(app_module, 'readiness_checker', checker)
+    
+    response = client.get('/ready')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['ready'] is True
+    assert 'describe:users' in data['checks']
+    assert 'age_seconds' in data
+    assert dynamo.calls == 2
+
+
+def test_ready_fails_on_access_denied(client, monkeypatch):
+    """Test that IAM errors make the instance not ready"""
+    from botocore.exceptions import ClientError
+    error = ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'DescribeTable')
+    checker = make_checker(FakeDynamoDBClient(error=error), interval=3600)
+    checker.check_now()
+    monkeypatch.setattr(checker, 'start', lambda: None)
+    monkeypatch.setattr(app_module, 'readiness_checker', checker)
+    
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['checks']['describe:users']['error'] == 'AccessDeniedException'
+
+
+def test_ready_stale_result_not_ready():
+    """Test that an old result is not trusted"""
+    checker = make_checker(FakeDynamoDBClient(), interval=3600, max_age=0)
+    checker.check_now()
+    checker.start = lambda: None
+    status = checker.status()
+    assert status['ready'] is False
+    assert status['reason'] == 'last check is stale'
+
+
+def test_ready_background_thread_runs_checks():
+    """Test that the checker thread populates the cache"""
+    import time
+    checker = make_checker(FakeDynamoDBClient(), interval=3600)
+    checker.start()
+    for _ in range(100):
+        if checker.status().get('ready'):
+            break
+        time.sleep(0.01)
+    checker.stop()
+    assert checker.status()['ready'] is True
@@ -82,11 +82,11 @@ def test_encrypt_decrypt_password():
     plain_password = "my_secret_password"
     
     encryption_key = get_encryption_key(user_id, password)
-    encrypted = encrypt_password(plain_password, encryption_key)
-    decrypted = decrypt_password(encrypted, encryption_key)
+    encrypted = encrypt_password(plain_password, encryption_key, user_id, 'entry-1')
+    decrypted = decrypt_password(encrypted, encryption_key, user_id, 'entry-1')
     
-    assert encrypted != plain_password  # Should be encrypted
+    assert plain_password.encode() not in encrypted  # Should be encrypted
     assert decrypted == plain_password  # Should decrypt correctly
-    assert isinstance(encrypted, str)
+    assert isinstance(encrypted, bytes)
     assert isinstance(decrypted, str)
 
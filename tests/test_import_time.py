@@ -0,0 +1,56 @@
+"""
+Tests for the cold import time of the app module
+"""
+import os
+import subprocess
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Milliseconds a cold `import app` may take in a fresh interpreter
+IMPORT_TIME_BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', '1500'))
+
+# Only needed by rarely used routes, so they must not load at import
+DEFERRED_MODULES = ('qrcode', 'PIL')
+
+
+def measure_import(module):
+    """Run `python -X importtime -c "import <module>"` and return {name: cumulative microseconds}"""
+    # Coverage and other pytest plugins hook child interpreters through the environment
+    env = {name: value for name, value in os.environ.items()
+           if not name.startswith(('COV_CORE_', 'COVERAGE_'))}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def test_rarely_used_dependencies_are_deferred():
+    """Test that importing the app doesn't load QR code or image libraries"""
+    timings = measure_import('app')
+    loaded = {name.split('.')[0] for name in timings}
+    assert not loaded & set(DEFERRED_MODULES)
+
+
+def test_import_time_within_budget():
+    """Test that a cold `import app` stays under IMPORT_TIME_BUDGET_MS"""
+    # Best of three, so a busy machine doesn't fail the build on its own
+    best = min(measure_import('app')['app'] for _ in range(3)) / 1000
+    assert best <= IMPORT_TIME_BUDGET_MS, \
+        f'import app took {best:.0f}ms, budget is {IMPORT_TIME_BUDGET_MS}ms'
@@ -0,0 +1,115 @@
+"""
+Test cases for the vault listing and per-entry secret endpoints
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from app import app, encrypt_password, get_encryption_key
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+LOGIN_PASSWORD = 'login-password'
+
+
+@pytest.fixture
+def table(monkeypatch, fake_audit_log):
+    table = FakeTable('user_id', 'password_id')
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    key = get_encryption_key(USER_ID, LOGIN_PASSWORD)
+    table.put_item(Item={'user_id': USER_ID, 'password_id': 'p1', 'website': 'example.com',
+                         'username': 'me', 'notes': 'private note', 'created_at': '2024-01-01',
+                         'encrypted_password': encrypt_password('s3cret!', key, USER_ID, 'p1')})
+    return table
+
+
+@pytest.fixture
+def client():
+    """Create a logged in test client"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['username'] = 'alice'
+            sess['user_password'] = LOGIN_PASSWORD
+        yield client
+
+
+def test_listing_has_no_secrets(client, table):
+    """Test that the listing returns metadata only"""
+    response = client.get('/api/passwords')
+    assert response.status_code == 200
+    entry = response.get_json()['passwords'][0]
+    assert entry == {'id': 'p1', 'website': 'example.com', 'username': 'me', 'folder': '', 'tags': [],
+                     'created_at': '2024-01-01'}
+    assert b's3cret!' not in response.data
+    assert b'private note' not in response.data
+
+
+def test_secret_endpoint_decrypts_one_entry(client, table):
+    """Test that a single entry is decrypted on demand"""
+    table.calls.clear()
+    response = client.get('/api/passwords/p1/secret')
+    assert response.status_code == 200
+    assert response.get_json() == {'id': 'p1', 'password': 's3cret!', 'notes': 'private note'}
+    assert [call[0] for call in table.calls] == ['get_item']
+
+
+def test_secret_endpoint_not_found(client, table):
+    """Test that unknown entries return 404"""
+    response = client.get('/api/passwords/missing/secret')
+    assert response.status_code == 404
+
+
+def test_secret_endpoint_requires_login(table):
+    """Test that secrets are not served without a session"""
+    with app.test_client() as anonymous:
+        response = anonymous.get('/api/passwords/p1/secret')
+    assert response.status_code == 401
+
+
+def test_add_returns_stored_entry(client, table):
+    """Test that adding returns the new listing entry without its secret"""
+    response = client.post('/api/passwords', json={'website': 'new.example', 'username': 'bob',
+                                                   'password': 'Another-Secret-42', 'notes': 'n'})
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['password']['id'] == data['id']
+    assert data['password']['website'] == 'new.example'
+    assert data['password']['username'] == 'bob'
+    assert b'Another-Secret-42' not in response.data
+
+
+def test_update_returns_stored_entry(client, table):
+    """Test that updating returns the entry as stored, with no extra read"""
+    table.calls.clear()
+    response = client.put('/api/passwords/p1', json={'username': 'renamed'})
+    assert response.status_code == 200
+    assert response.get_json()['password'] == {'id': 'p1', 'website': 'example.com', 'username': 'renamed',
+                                               'folder': '', 'tags': [], 'created_at': '2024-01-01'}
+    assert [call[0] for call in table.calls] == ['update_item']
+
+
+def test_update_unknown_entry_creates_nothing(client, table):
+    """Test that updating a missing entry is a 404 and leaves no stub in the listing"""
+    response = client.put('/api/passwords/missing', json={'username': 'ghost'})
+    assert response.status_code == 404
+    assert (USER_ID, 'missing') not in table.items
+    
+    table.put_item(Item={'user_id': USER_ID, 'password_id': 'stub', 'username': 'ghost'})
+    assert [entry['id'] for entry in client.get('/api/passwords').get_json()['passwords']] == ['p1']
@@ -0,0 +1,115 @@
+"""
+Test cases for the sampled request profiler
+"""
+import glob
+import os
+import pstats
+import sys
+import time
+
+from flask import Flask
+
+# Add parent directory to path to import profiling
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import profiling
+from profiling import HEADER, sign_token, verify_token
+
+
+SECRET = 'profile-secret'
+
+
+def busy_work():
+    deadline = time.perf_counter() + 0.03
+    while time.perf_counter() < deadline:
+        pass
+
+
+def make_app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config.update({'PROFILE_DIR': str(tmp_path), 'PROFILE_FLUSH_SECONDS': 0, **config})
+    profiler = profiling.init_app(app)
+
+    @app.route('/work')
+    def work():
+        busy_work()
+        return 'ok'
+
+    return app, profiler
+
+
+def dumps(tmp_path, suffix):
+    return glob.glob(str(tmp_path / f'*{suffix}'))
+
+
+def test_disabled_registers_no_hooks(tmp_path):
+    """With no sample rate or secret nothing runs per request"""
+    app, profiler = make_app(tmp_path)
+    assert profiler is None
+    assert not app.before_request_funcs and not app.teardown_request_funcs
+    app.test_client().get('/work')
+    assert os.listdir(tmp_path) == []
+
+
+def test_sampled_request_writes_pstats_and_collapsed_stacks(tmp_path):
+    """A profiled request leaves a loadable pstats file and flamegraph input for its endpoint"""
+    app, _ = make_app(tmp_path, PROFILE_SAMPLE_RATE=1.0)
+    assert app.test_client().get('/work').data == b'ok'
+
+    [stats_path] = dumps(tmp_path, '.pstats')
+    assert os.path.basename(stats_path).startswith('work-')
+    functions = {name for _, _, name in pstats.Stats(stats_path).stats}
+    assert 'busy_work' in functions
+
+    [collapsed_path] = dumps(tmp_path, '.collapsed')
+    with open(collapsed_path, encoding='utf-8') as collapsed:
+        lines = collapsed.read().splitlines()
+    assert any('test_profiling.py:busy_work' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_signed_header_selects_request(tmp_path):
+    """Only requests with a valid, unexpired token are profiled when sampling is off"""
+    app, _ = make_app(tmp_path, PROFILE_HEADER_SECRET=SECRET)
+    client = app.test_client()
+
+    client.get('/work')
+    client.get('/work', headers={HEADER: sign_token('wrong-secret', time.time() + 60)})
+    client.get('/work', headers={HEADER: sign_token(SECRET, time.time() - 1)})
+    assert dumps(tmp_path, '.pstats') == []
+
+    client.get('/work', headers={HEADER: sign_token(SECRET, time.time() + 60)})
+    assert len(dumps(tmp_path, '.pstats')) == 1
+
+
+def test_token_verification():
+    """Tokens are bound to the secret and expiry"""
+    token = sign_token(SECRET, 2000)
+    assert verify_token(SECRET, token, now=1000)
+    assert not verify_token(SECRET, token, now=3000)
+    assert not verify_token(SECRET, token.replace('2000', '9999'), now=1000)
+    assert not verify_token('', token, now=1000)
+    assert not verify_token(SECRET, 'garbage', now=1000)
+
+
+def test_old_dumps_are_rotated(tmp_path):
+    """Only the newest PROFILE_KEEP dumps per endpoint are kept"""
+    app, _ = make_app(tmp_path, PROFILE_SAMPLE_RATE=1.0, PROFILE_KEEP=2)
+    for _ in range(4):
+        app.test_client().get('/work')
+    assert len(dumps(tmp_path, '.pstats')) == 2
+    assert len(dumps(tmp_path, '.collapsed')) == 2
+
+
+def test_requests_are_aggregated_between_flushes(tmp_path):
+    """Profiles of one endpoint are merged until the flush interval passes"""
+    app, profiler = make_app(tmp_path, PROFILE_SAMPLE_RATE=1.0, PROFILE_FLUSH_SECONDS=3600)
+    client = app.test_client()
+    for _ in range(3):
+        client.get('/work')
+    # The first profile is written at once, the next two wait for the interval
+    assert len(dumps(tmp_path, '.pstats')) == 1
+    profiler.flush()
+    newest = max(dumps(tmp_path, '.pstats'), key=os.path.getmtime)
+    calls = [stat[0] for (_, _, name), stat in pstats.Stats(newest).stats.items() if name == 'busy_work']
+    assert calls == [2]
@@ -0,0 +1,88 @@
+"""
+Test cases for login throttling (token buckets and client IP detection)
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from app import app
+from rate_limit import BucketStore, MemoryBucketStore, TokenBucketLimiter, client_ip, parse_rate
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    
+    with app.test_client() as client:
+        yield client
+
+
+def test_parse_rate():
+    """Test parsing of 'attempts/seconds' limits"""
+    assert parse_rate('10/300') == (10, 10 / 300)
+    with pytest.raises(ValueError):
+        parse_rate('0/60')
+
+
+def test_token_bucket_refills():
+    """Test that a bucket empties and refills over time"""
+    store = MemoryBucketStore()
+    for _ in range(3):
+        assert store.consume('k', 3, 1.0, now=100.0)[0] is True
+    allowed, retry_after = store.consume('k', 3, 1.0, now=100.0)
+    assert allowed is False
+    assert retry_after == pytest.approx(1.0)
+    assert store.consume('k', 3, 1.0, now=101.0)[0] is True
+
+
+def test_memory_store_is_bounded():
+    """Test that the in-memory store evicts the oldest buckets"""
+    store = MemoryBucketStore(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        store.consume(key, 1, 1.0, now=0.0)
+    assert list(store._buckets) == ['b', 'c']
+
+
+def test_bucket_store_is_abstract():
+    """Test that a store missing part of the interface can't be created"""
+    class ConsumeOnly(BucketStore):
+        def consume(self, key, capacity, refill_rate, now=None):
+            return True, 0
+    
+    with pytest.raises(TypeError):
+        ConsumeOnly()
+
+
+def test_client_ip_uses_last_trusted_hop():
+    """Test that spoofed X-Forwarded-For entries are ignored"""
+    with app.test_request_context('/', headers={'X-Forwarded-For': '6.6.6.6, 203.0.113.7'},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        from flask import request
+        assert client_ip(request, 1) == '203.0.113.7'
+        assert client_ip(request, 0) == '10.0.0.1'
+
+
+def test_login_rejected_when_throttled(client, monkeypatch):
+    """Test that throttled logins get 429 without touching the database"""
+    limiter = TokenBucketLimiter(MemoryBucketStore(), '1/3600', 'login-user')
+    limiter.hit('alice')
+    monkeypatch.setattr(app_module, 'login_user_limiter', limiter)
+    
+    response = client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert b'Too many login attempts' in response.data
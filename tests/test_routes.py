@@ -68,3 +68,22 @@ def test_forgot_password_get_route(client):
     response = client.get('/forgot-password')
     assert response.status_code == 200
 
+
+
+def test_register_rejects_breached_password(client, tmp_path, monkeypatch):
+    """Test that registration refuses passwords found in the breach index"""
+    import hashlib
+    from breach_check import BreachIndex, build_index
+    path = str(tmp_path / 'breached.idx')
+    build_index([hashlib.sha1(b'letmein123').hexdigest() + ':5\n'], path)
+    monkeypatch.setattr(app.extensions['password_manager'], 'breach_index', BreachIndex(path))
+    monkeypatch.setitem(app.config, 'BREACHED_PASSWORDS_FILE', path)
+    
+    response = client.post('/register', data={
+        'username': 'newuser',
+        'email': 'new@example.com',
+        'password': 'letmein123',
+        'confirm_password': 'letmein123'
+    })
+    assert response.status_code == 200
+    assert b'known data breach' in response.data
@@ -0,0 +1,87 @@
+"""
+Test cases for the per-request span recorder and Server-Timing header
+"""
+import json
+import os
+import sys
+
+import pytest
+from flask import Flask, render_template_string
+
+# Add parent directory to path to import server_timing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import server_timing
+from server_timing import SpanRecorder, span
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    server_timing.init_app(app)
+
+    @app.route('/work')
+    def work():
+        with span('kdf'):
+            pass
+        for _ in range(3):
+            with span('fernet.decrypt'):
+                pass
+        return render_template_string('<p>{{ value }}</p>', value='ok')
+
+    @app.after_request
+    def add_header(response):
+        if app.config.get('SERVER_TIMING_ENABLED'):
+            response = server_timing.apply_server_timing(response)
+        return response
+
+    return app
+
+
+def test_span_is_noop_outside_request():
+    """Spans outside a request context must not fail"""
+    with span('kdf'):
+        value = 1
+    assert value == 1
+
+
+def test_recorder_nests_and_aggregates():
+    """Nested spans form a tree and totals are grouped by name"""
+    recorder = SpanRecorder()
+    outer = recorder.start('dynamodb.Query')
+    inner = recorder.start('fernet.decrypt')
+    recorder.end(inner)
+    recorder.end(outer)
+    tree = recorder.tree()
+    assert tree[0]['name'] == 'dynamodb.Query'
+    assert tree[0]['children'][0]['name'] == 'fernet.decrypt'
+    assert recorder.totals['fernet.decrypt'][0] == 1
+
+
+def test_server_timing_header_enabled():
+    """Server-Timing header lists aggregated spans when enabled"""
+    app = make_app(SERVER_TIMING_ENABLED=True)
+    response = app.test_client().get('/work')
+    header = response.headers['Server-Timing']
+    assert 'kdf;dur=' in header
+    assert 'fernet.decrypt;dur=' in header and 'desc="3 calls"' in header
+    assert 'template.' in header
+    assert 'total;dur=' in header
+
+
+def test_server_timing_header_disabled():
+    """No header and no recorder when the feature is off"""
+    app = make_app()
+    response = app.test_client().get('/work')
+    assert 'Server-Timing' not in response.headers
+
+
+def test_slow_request_logged_as_json(capsys):
+    """Requests over the threshold are logged as a JSON span tree"""
+    app = make_app(SLOW_REQUEST_LOG_MS=0.0001)
+    app.test_client().get('/work')
+    line = capsys.readouterr().err.strip().splitlines()[-1]
+    record = json.loads(line)
+    assert record['event'] == 'slow_request'
+    assert record['path'] == '/work'
+    assert any(node['name'] == 'kdf' for node in record['spans'])
@@ -0,0 +1,125 @@
+"""
+Test cases for server-side sessions
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+
+import app as app_module
+from app import app
+from session_store import DynamoDBSessionStore, MemorySessionStore
+from tests.fake_dynamodb import FakeTable
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    
+    with app.test_client() as client:
+        yield client
+
+
+def test_memory_store_expires_entries(monkeypatch):
+    """Test that entries disappear after their TTL"""
+    store = MemorySessionStore()
+    now = [1000.0]
+    monkeypatch.setattr('session_store.time.monotonic', lambda: now[0])
+    store.set('sid', {'user_id': 'u1'}, ttl=60)
+    assert store.get('sid') == {'user_id': 'u1'}
+    now[0] += 61
+    assert store.get('sid') is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    """Test that the store is bounded and keeps recently used sessions"""
+    store = MemorySessionStore(max_entries=2)
+    store.set('a', {'n': 1}, ttl=60)
+    store.set('b', {'n': 2}, ttl=60)
+    store.get('a')
+    store.set('c', {'n': 3}, ttl=60)
+    assert store.get('b') is None
+    assert store.get('a') == {'n': 1}
+
+
+def test_session_cookie_is_opaque(client):
+    """Test that only a session ID is sent to the browser"""
+    with client.session_transaction() as sess:
+        sess['user_id'] = 'user-1'
+        sess['username'] = 'alice'
+        sess['user_password'] = 'hunter22'
+    
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    assert 'hunter22' not in cookie.value
+    assert app.extensions['password_manager'].session_store.get(cookie.value)['username'] == 'alice'
+    
+    response = client.get('/dashboard')
+    assert response.status_code == 200
+
+
+def test_logout_invalidates_server_session(client, fake_audit_log):
+    """Test that logout removes the session from the store"""
+    with client.session_transaction() as sess:
+        sess['user_id'] = 'user-1'
+        sess['username'] = 'alice'
+    sid = client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+    
+    client.get('/logout')
+    assert app.extensions['password_manager'].session_store.get(sid) is None
+    
+    # Replaying the old ID no longer authenticates
+    client.set_cookie(app.config['SESSION_COOKIE_NAME'], sid)
+    response = client.get('/dashboard', follow_redirects=False)
+    assert response.status_code == 302
+
+
+def test_anonymous_page_views_are_not_stored(monkeypatch):
+    """Test that CSRF-only sessions live in a signed cookie, not the store"""
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', True)
+    monkeypatch.setattr(app_module, 'users_table', FakeTable('username'))
+    store = app.extensions['password_manager'].session_store
+    before = len(store)
+    
+    with app.test_client() as client:
+        for _ in range(5):
+            page = client.get('/login').get_data(as_text=True)
+        assert len(store) == before
+        assert client.get_cookie(app.config['SESSION_COOKIE_NAME']) is None
+        
+        # The token from the cookie-held session still validates
+        token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+        response = client.post('/login', data={'csrf_token': token, 'username': 'nobody', 'password': 'pw'})
+        assert response.status_code == 200
+
+
+def test_dynamodb_store_slides_expiry(monkeypatch):
+    """Test that reads push expires_at forward like the memory store"""
+    table = FakeTable('session_id')
+    store = DynamoDBSessionStore(table)
+    now = [1000.0]
+    monkeypatch.setattr('session_store.time.time', lambda: now[0])
+    store.set('sid', {'user_id': 'u1'}, ttl=600)
+    
+    now[0] += 500
+    assert store.get('sid') == {'user_id': 'u1'}
+    now[0] += 500
+    assert store.get('sid') == {'user_id': 'u1'}
+    assert table.items[('sid', None)]['expires_at'] == 2600
+    
+    store.delete('sid')
+    store._refresh('sid', 9999)
+    assert table.items == {}
@@ -0,0 +1,119 @@
+"""
+Tests for single-flight vault reads and the session check endpoint
+"""
+import pytest
+import os
+import sys
+import threading
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import app AFTER setting environment variables
+import app as app_module
+from app import app
+from single_flight import SingleFlight
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable('user_id', 'password_id')
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    return table
+
+
+@pytest.fixture
+def client():
+    """Create a logged in test client"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['username'] = 'alice'
+            sess['user_password'] = 'login-password'
+        yield client
+
+
+def run_concurrently(flight, key, fn, count):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(key, fn))) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_calls_share_one_result():
+    """Test that waiters get the leader's result without calling fn"""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow_read():
+        calls.append(1)
+        release.wait(2)
+        return ['entry']
+
+    threads, results = run_concurrently(flight, USER_ID, slow_read, 5)
+    while flight._flights.get(USER_ID) is None or flight._flights[USER_ID].waiters < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [['entry']] * 5
+
+
+def test_errors_are_not_cached():
+    """Test that a failed call raises and the next call runs again"""
+    flight = SingleFlight()
+
+    def failing_read():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        flight.do(USER_ID, failing_read)
+    assert flight.do(USER_ID, lambda: 'ok') == 'ok'
+
+
+def test_forget_starts_a_new_flight():
+    """Test that callers after forget() don't join the earlier call"""
+    flight = SingleFlight()
+    release = threading.Event()
+    threads, results = run_concurrently(flight, USER_ID, lambda: release.wait(2) and 'old', 1)
+    while USER_ID not in flight._flights:
+        threading.Event().wait(0.001)
+
+    flight.forget(USER_ID)
+    assert flight.do(USER_ID, lambda: 'new') == 'new'
+    release.set()
+    threads[0].join()
+    assert results == ['old']
+
+
+def test_session_endpoint_skips_dynamodb(client, table):
+    """Test that the session check doesn't read the vault"""
+    response = client.get('/api/session')
+    assert response.status_code == 200
+    assert response.get_json() == {'authenticated': True, 'username': 'alice'}
+    assert table.calls == []
+
+
+def test_session_endpoint_requires_login(table):
+    """Test that the session check returns 401 without a session"""
+    with app.test_client() as anonymous:
+        assert anonymous.get('/api/session').status_code == 401
@@ -0,0 +1,142 @@
+"""
+Test cases for the vault health (reused / weak password) report
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from botocore.exceptions import ClientError
+
+import app as app_module
+from app import app, encrypt_password, get_encryption_key
+from vault_health import build_report, fingerprint, fingerprint_key, strength_score
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+LOGIN_PASSWORD = 'login-password'
+
+
+@pytest.fixture
+def table(monkeypatch, fake_audit_log):
+    table = FakeTable('user_id', 'password_id')
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    return table
+
+
+@pytest.fixture
+def client():
+    """Create a logged in test client"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['user_password'] = LOGIN_PASSWORD
+        yield client
+
+
+def test_strength_score():
+    """Test the rough strength scale"""
+    assert strength_score('abc') == 0
+    assert strength_score('aaaaaaaaaaaa') == 0
+    assert strength_score('abcdefgh') == 1
+    assert strength_score('Abcdefgh1234!') == 4
+    assert strength_score('Abcdefgh1234!', breached=True) == 0
+
+
+def test_fingerprint_is_keyed():
+    """Test that fingerprints depend on the user's key"""
+    key_a = fingerprint_key(get_encryption_key('a', 'pw'))
+    key_b = fingerprint_key(get_encryption_key('b', 'pw'))
+    assert fingerprint(key_a, 'same') == fingerprint(key_a, 'same')
+    assert fingerprint(key_a, 'same') != fingerprint(key_b, 'same')
+
+
+def test_build_report_groups_duplicates():
+    """Test grouping of reused fingerprints and weak entries"""
+    report = build_report({'a': ('f1', 3), 'b': ('f1', 3), 'c': ('f2', 0)})
+    assert report['reused'] == [['a', 'b']]
+    assert report['reused_count'] == 2
+    assert report['weak'] == [{'id': 'c', 'score': 0}]
+
+
+def test_report_updates_incrementally(client, table):
+    """Test that adds and deletes keep the report current without decrypting"""
+    ids = []
+    for website, password in (('a.com', 'Shared-Passw0rd!'), ('b.com', 'Shared-Passw0rd!'), ('c.com', 'abc')):
+        response = client.post('/api/passwords', json={'website': website, 'password': password})
+        ids.append(response.get_json()['id'])
+    
+    report = client.get('/api/passwords/health').get_json()
+    assert report['total'] == 3
+    assert report['reused'] == [sorted(ids[:2])]
+    assert report['weak'][0]['id'] == ids[2]
+    
+    client.delete(f'/api/passwords/{ids[1]}')
+    table.calls.clear()
+    report = client.get('/api/passwords/health').get_json()
+    assert report['reused'] == []
+    assert report['total'] == 2
+    assert all(call[0] == 'get_item' for call in table.calls)
+
+
+def test_report_built_once_for_existing_vault(client, table):
+    """Test that vaults from before health tracking are fingerprinted on first request"""
+    key = get_encryption_key(USER_ID, LOGIN_PASSWORD)
+    for password_id in ('old-1', 'old-2'):
+        table.put_item(Item={'user_id': USER_ID, 'password_id': password_id, 'website': password_id,
+                             'encrypted_password': encrypt_password('reused-secret-1', key, USER_ID, password_id)})
+    
+    report = client.get('/api/passwords/health').get_json()
+    assert report['reused'] == [['old-1', 'old-2']]
+    
+    response = client.put('/api/passwords/old-2', json={'password': 'Different-Secret-99'})
+    assert response.status_code == 200
+    assert client.get('/api/passwords/health').get_json()['reused'] == []
+
+
+def test_reserved_ids_are_not_entries(client, table):
+    """Test that health shards can't be deleted through the entry API"""
+    client.get('/api/passwords/health')
+    assert client.delete('/api/passwords/~health%230').status_code == 404
+    assert (USER_ID, '~health#0') in table.items
+
+
+def test_failed_shard_update_keeps_the_write(client, table):
+    """Test that a throttled health shard doesn't fail the request, and the report is rebuilt"""
+    first = client.post('/api/passwords', json={'website': 'a.com', 'password': 'Shared-Passw0rd!'}).get_json()['id']
+    client.get('/api/passwords/health')
+    
+    original = table.update_item
+    
+    def update_item(**kwargs):
+        if kwargs['Key']['password_id'].startswith('~health#'):
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem')
+        return original(**kwargs)
+    
+    table.update_item = update_item
+    response = client.post('/api/passwords', json={'website': 'b.com', 'password': 'Shared-Passw0rd!'})
+    assert response.status_code == 201
+    assert not any(key[1].startswith('~health#') for key in table.items)
+    assert client.put(f'/api/passwords/{first}', json={'notes': 'x', 'password': 'Shared-Passw0rd!'}).status_code == 200
+    extra = client.post('/api/passwords', json={'website': 'c.com', 'password': 'Other-Passw0rd!'}).get_json()['id']
+    assert client.delete(f'/api/passwords/{extra}').status_code == 200
+    
+    table.update_item = original
+    report = client.get('/api/passwords/health').get_json()
+    assert report['total'] == 2
+    assert report['reused'] == [sorted([first, response.get_json()['id']])]
+    assert len([item for item in table.items.values() if item.get('website') == 'b.com']) == 1
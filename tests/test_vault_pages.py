@@ -0,0 +1,174 @@
+"""
+Test cases for the packed vault layout
+"""
+import pytest
+import os
+import sys
+
+# Set environment variables BEFORE importing app
+os.environ['SECRET_KEY'] = 'test-secret-key-for-testing-only'
+os.environ['AWS_REGION'] = 'us-east-1'
+os.environ['DYNAMODB_USERS_TABLE'] = 'PasswordManagerV2-Users-Test'
+os.environ['DYNAMODB_PASSWORDS_TABLE'] = 'PasswordManagerV2-Passwords-Test'
+os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-key'
+
+# Add parent directory to path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from botocore.exceptions import ClientError
+
+import app as app_module
+from app import app, encrypt_password, get_encryption_key
+import vault_pages
+from vault_pages import PAGE_PREFIX, PackedVault, page_key
+from tests.fake_dynamodb import FakeTable
+
+
+USER_ID = 'user-1'
+KEY = get_encryption_key(USER_ID, 'login-password')
+
+
+def make_entry(entry_id, **fields):
+    entry = {'id': entry_id, 'website': f'{entry_id}.example.com', 'username': 'me',
+             'password': f'pw-{entry_id}', 'notes': '', 'created_at': entry_id, 'updated_at': entry_id}
+    entry.update(fields)
+    return entry
+
+
+@pytest.fixture
+def table():
+    return FakeTable('user_id', 'password_id')
+
+
+@pytest.fixture
+def vault(table):
+    return PackedVault(table, USER_ID, KEY)
+
+
+def test_entries_share_one_page(vault, table):
+    """Test that small entries are packed into a single encrypted item"""
+    vault.add([make_entry(f'e{i}') for i in range(50)])
+    assert list(table.items) == [(USER_ID, page_key(0))]
+    page = table.items[(USER_ID, page_key(0))]
+    assert b'pw-e1' not in page['page_blob'].value
+    pages, _ = vault.load()
+    assert [entry['id'] for entry in vault.entries(pages)][:3] == ['e0', 'e1', 'e10']
+
+
+def test_full_page_starts_a_new_one(vault, table, monkeypatch):
+    """Test that pages are capped at MAX_PAGE_BYTES"""
+    monkeypatch.setattr(vault_pages, 'MAX_PAGE_BYTES', 600)
+    vault.add([make_entry(f'e{i}', notes=os.urandom(100).hex()) for i in range(6)])
+    page_ids = [key[1] for key in table.items]
+    assert len(page_ids) > 1
+    assert all(int(item['page_bytes']) <= 600 for item in table.items.values())
+    pages, _ = vault.load()
+    assert len(vault.entries(pages)) == 6
+
+
+def test_update_rewrites_single_page(vault, table):
+    """Test that an edit touches only the page holding the entry"""
+    vault.add([make_entry('a'), make_entry('b')])
+    version = table.items[(USER_ID, page_key(0))]['page_version']
+    table.calls.clear()
+    updated = vault.update('b', {'password': 'new', 'updated_at': 'z'})
+    assert updated['password'] == 'new'
+    assert [call for call in table.calls if call[0] == 'put_item'] == [('put_item', (USER_ID, page_key(0)))]
+    assert table.items[(USER_ID, page_key(0))]['page_version'] == version + 1
+    assert vault.get_entry('b')['password'] == 'new'
+
+
+def test_stale_version_is_rejected(vault, table):
+    """Test that a write based on an old page version fails its condition"""
+    vault.add([make_entry('a')])
+    page = vault.get_page(0)
+    vault.update('a', {'notes': 'changed'})
+    with pytest.raises(Exception) as excinfo:
+        vault._write_page(page, vault_pages.pack_entries(list(page.entries.values()), KEY))
+    assert 'ConditionalCheckFailed' in str(excinfo.value)
+
+
+def test_delete_last_entry_removes_page(vault, table):
+    """Test that deleting removes the entry and empty pages"""
+    vault.add([make_entry('a')])
+    assert vault.delete('a') is True
+    assert vault.delete('a') is False
+    assert table.items == {}
+
+
+def test_get_passwords_migrates_legacy_items(table, monkeypatch):
+    """Test that per-item entries are moved into pages on first listing"""
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    monkeypatch.setitem(app.config, 'VAULT_LAYOUT', 'packed')
+    for i in range(3):
+        table.put_item(Item={'user_id': USER_ID, 'password_id': f'legacy-{i}', 'website': f'site{i}',
+                             'username': '', 'notes': '', 'created_at': str(i),
+                             'encrypted_password': encrypt_password(f'secret{i}', KEY, USER_ID, f'legacy-{i}')})
+    
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['user_password'] = 'login-password'
+        response = client.get('/api/passwords')
+        secret = client.get('/api/passwords/legacy-1/secret')
+    
+    assert response.status_code == 200
+    assert [p['website'] for p in response.get_json()['passwords']] == ['site0', 'site1', 'site2']
+    assert all(key[1].startswith(PAGE_PREFIX) for key in table.items)
+    assert secret.get_json()['password'] == 'secret1'
+
+
+def test_empty_packed_vault_lists_after_health_and_delete(table, monkeypatch, fake_audit_log):
+    """Test that health shards don't make an empty packed vault look undecryptable"""
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    monkeypatch.setitem(app.config, 'VAULT_LAYOUT', 'packed')
+    
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['user_password'] = 'login-password'
+        assert client.get('/api/passwords/health').status_code == 200
+        response = client.get('/api/passwords')
+        assert response.status_code == 200
+        assert response.get_json()['passwords'] == []
+        
+        password_id = client.post('/api/passwords', json={'website': 'a.example', 'password': 'Pw-123456'}).get_json()['id']
+        client.delete(f'/api/passwords/{password_id}')
+        response = client.get('/api/passwords')
+    
+    assert response.status_code == 200
+    assert response.get_json()['passwords'] == []
+    assert any(key[1].startswith('~health#') for key in table.items)
+
+
+def test_page_conflict_and_wrong_key_are_handled(table, monkeypatch, fake_audit_log):
+    """Test that a contended page gives 409 and an undecryptable page a JSON error"""
+    monkeypatch.setattr(app_module, 'passwords_table', table)
+    monkeypatch.setitem(app.config, 'VAULT_LAYOUT', 'packed')
+    PackedVault(table, USER_ID, KEY).add([make_entry('a')])
+    
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = USER_ID
+            sess['user_password'] = 'login-password'
+        def always_stale(vault, page, blob):
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
+        
+        with monkeypatch.context() as patch:
+            patch.setattr(PackedVault, '_write_page', always_stale)
+            assert client.put('/api/passwords/a', json={'notes': 'x'}).status_code == 409
+            assert client.put('/api/passwords/a/folder', json={'folder': 'Work'}).status_code == 409
+            assert client.delete('/api/passwords/a').status_code == 409
+        
+        with client.session_transaction() as sess:
+            sess['user_password'] = 'old-password'
+        for response in (client.put('/api/passwords/a', json={'notes': 'x'}),
+                         client.get('/api/passwords/a/secret')):
+            assert response.status_code == 500
+            assert 'Unable to decrypt' in response.get_json()['error']
@@ -0,0 +1,145 @@
+"""
+Vault health: reused and weak password detection without decrypting the vault.
+
+Every entry gets a keyed fingerprint (HMAC-SHA256 of the plaintext under a
+key derived from the user's encryption key, truncated to 8 bytes) and a
+0-4 strength score. Both are kept in a few "health" items in the passwords
+table (sort key ``~health#N``) as a map of entry ID -> [fingerprint, score],
+sharded by entry ID. Adds, edits and deletes update one map key in one
+shard; the report groups fingerprints with a dict in O(n).
+
+Shard updates are best-effort: the entry itself is already written, so a
+failed update only drops the shards and the next report rebuilds them.
+"""
+import base64
+import hashlib
+import hmac
+import sys
+import zlib
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from dynamo_guard import CircuitOpenError
+from server_timing import span
+
+
+HEALTH_PREFIX = '~health#'
+HEALTH_SHARDS = 4
+WEAK_SCORE = 1
+
+
+def fingerprint_key(encryption_key):
+    return hmac.new(base64.urlsafe_b64decode(encryption_key), b'vault-fingerprint', hashlib.sha256).digest()
+
+
+def fingerprint(fp_key, password_text):
+    return hmac.new(fp_key, password_text.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+
+def strength_score(password_text, breached=False):
+    """Rough 0 (very weak) to 4 (strong) score from length and character variety"""
+    if breached:
+        return 0
+    length = len(password_text)
+    classes = sum([
+        any(c.islower() for c in password_text),
+        any(c.isupper() for c in password_text),
+        any(c.isdigit() for c in password_text),
+        any(not c.isalnum() for c in password_text),
+    ])
+    if length < 8 or len(set(password_text)) <= 2:
+        return 0
+    score = 1
+    if length >= 12:
+        score += 1
+    if classes >= 3:
+        score += 1
+    if length >= 16 or (length >= 12 and classes == 4):
+        score += 1
+    return score
+
+
+def shard_key(password_id):
+    return f'{HEALTH_PREFIX}{zlib.crc32(password_id.encode("utf-8")) % HEALTH_SHARDS}'
+
+
+def build_report(entries):
+    """Group ``{id: (fingerprint, score)}`` into reused sets and weak entries"""
+    with span('health.report'):
+        groups = {}
+        weak = []
+        for password_id, (fp, score) in entries.items():
+            groups.setdefault(fp, []).append(password_id)
+            if score <= WEAK_SCORE:
+                weak.append({'id': password_id, 'score': score})
+        reused = [sorted(ids) for ids in groups.values() if len(ids) > 1]
+        reused.sort(key=len, reverse=True)
+        return {
+            'total': len(entries),
+            'reused': reused,
+            'reused_count': sum(len(ids) for ids in reused),
+            'weak': sorted(weak, key=lambda item: (item['score'], item['id']))
+        }
+
+
+class VaultHealth:
+    def __init__(self, table, user_id):
+        self.table = table
+        self.user_id = user_id
+
+    def load(self):
+        """Return ``{id: (fingerprint, score)}``, or None if never built"""
+        entries = {}
+        found = False
+        for shard in range(HEALTH_SHARDS):
+            item = self.table.get_item(
+                Key={'user_id': self.user_id, 'password_id': f'{HEALTH_PREFIX}{shard}'}
+            ).get('Item')
+            if item is None:
+                continue
+            found = True
+            for password_id, (fp, score) in item.get('entries', {}).items():
+                entries[password_id] = (fp, int(score))
+        return entries if found else None
+
+    def rebuild(self, entries):
+        shards = {f'{HEALTH_PREFIX}{shard}': {} for shard in range(HEALTH_SHARDS)}
+        for password_id, (fp, score) in entries.items():
+            shards[shard_key(password_id)][password_id] = [fp, score]
+        with self.table.batch_writer() as batch:
+            for key, shard_entries in shards.items():
+                batch.put_item(Item={'user_id': self.user_id, 'password_id': key, 'entries': shard_entries})
+
+    def record(self, password_id, fp, score):
+        self._update(password_id, 'SET entries.#id = :value', {':value': [fp, score]})
+
+    def forget(self, password_id):
+        self._update(password_id, 'REMOVE entries.#id', None)
+
+    def _update(self, password_id, expression, values):
+        kwargs = {'ExpressionAttributeValues': values} if values else {}
+        try:
+            self.table.update_item(
+                Key={'user_id': self.user_id, 'password_id': shard_key(password_id)},
+                UpdateExpression=expression,
+                ConditionExpression='attribute_exists(entries)',
+                ExpressionAttributeNames={'#id': password_id},
+                **kwargs
+            )
+        except ClientError as e:
+            # Not built yet: the first report request will include this entry
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                self._drop(password_id, e)
+        except (BotoCoreError, CircuitOpenError) as e:
+            self._drop(password_id, e)
+
+    def _drop(self, password_id, error):
+        # A stale report is worse than none, so delete the shards; load() then returns None
+        print(f"WARNING: vault health update for {password_id} failed, dropping the report: {error}",
+              file=sys.stderr)
+        try:
+            with self.table.batch_writer() as batch:
+                for shard in range(HEALTH_SHARDS):
+                    batch.delete_item(Key={'user_id': self.user_id, 'password_id': f'{HEALTH_PREFIX}{shard}'})
+        except (BotoCoreError, ClientError) as e:
+            print(f"WARNING: could not drop the vault health report for {self.user_id}: {e}", file=sys.stderr)
@@ -0,0 +1,288 @@
+"""
+Packed vault layout.
+
+Instead of one DynamoDB item per vault entry, a user's entries are grouped
+into a few "page" items in the passwords table (sort key ``~page#NNNN``).
+Each page holds up to ``MAX_PAGE_BYTES`` of JSON entries, zlib compressed
+and Fernet encrypted as a single blob. Page items also carry the entry IDs
+in the clear so single-entry operations can find their page with a
+projection query and then read or rewrite just that page.
+
+Writes are guarded by ``page_version`` (optimistic concurrency). Legacy
+per-entry items are folded into pages the first time the vault is loaded.
+"""
+import base64
+import json
+import zlib
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from cryptography.fernet import Fernet, InvalidToken
+
+from server_timing import span
+
+
+PAGE_PREFIX = '~page#'
+# DynamoDB items are capped at 400 KB; leave room for the other attributes
+MAX_PAGE_BYTES = 300 * 1024
+WRITE_ATTEMPTS = 3
+
+
+class PageConflict(Exception):
+    """A page changed underneath us more than WRITE_ATTEMPTS times"""
+
+
+def page_key(page_no):
+    return f'{PAGE_PREFIX}{page_no:04d}'
+
+
+def pack_entries(entries, encryption_key):
+    with span('vault.pack'):
+        raw = json.dumps(entries, separators=(',', ':')).encode('utf-8')
+        token = Fernet(encryption_key).encrypt(zlib.compress(raw))
+        # Store the token's bytes, not its base64 text
+        return base64.urlsafe_b64decode(token)
+
+
+def unpack_entries(blob, encryption_key):
+    with span('vault.unpack'):
+        token = base64.urlsafe_b64encode(bytes(blob))
+        raw = zlib.decompress(Fernet(encryption_key).decrypt(token))
+        return json.loads(raw)
+
+
+class Page:
+    def __init__(self, page_no, version=0, entries=None):
+        self.page_no = page_no
+        self.version = version
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def from_item(cls, item, encryption_key):
+        try:
+            entries = unpack_entries(item['page_blob'].value, encryption_key)
+        except InvalidToken:
+            # Same error type as decrypt_password, which the routes already handle
+            raise ValueError(f"Unable to decrypt vault page {item['page_no']}. This may happen if your "
+                             "login password was changed or encryption key is invalid.") from None
+        return cls(int(item['page_no']), int(item['page_version']),
+                   {entry['id']: entry for entry in entries})
+
+
+class PackedVault:
+    def __init__(self, table, user_id, encryption_key):
+        self.table = table
+        self.user_id = user_id
+        self.encryption_key = encryption_key
+
+    # Reads
+
+    def load(self, items=None):
+        """Return (pages, legacy_items) for the user.
+
+        ``items`` can be passed in when the caller already queried the whole
+        partition; otherwise the partition is queried here.
+        """
+        if items is None:
+            items = self._query(KeyConditionExpression=Key('user_id').eq(self.user_id))
+        pages, legacy = [], []
+        for item in items:
+            if item['password_id'].startswith(PAGE_PREFIX):
+                try:
+                    pages.append(Page.from_item(item, self.encryption_key))
+                except ValueError:
+                    # Wrong key (e.g. login password changed); treat like an undecryptable item
+                    continue
+            elif item.get('encrypted_password'):
+                legacy.append(item)
+        return pages, legacy
+
+    def entries(self, pages):
+        # A crash between writes can leave an entry in two pages; keep the newest
+        merged = {}
+        for page in pages:
+            for entry_id, entry in page.entries.items():
+                current = merged.get(entry_id)
+                if current is None or entry.get('updated_at', '') >= current.get('updated_at', ''):
+                    merged[entry_id] = entry
+        return sorted(merged.values(), key=lambda entry: entry.get('created_at', ''))
+
+    def directory(self):
+        """Page numbers, versions, sizes and entry IDs without the blobs"""
+        return self._query(
+            KeyConditionExpression=Key('user_id').eq(self.user_id) & Key('password_id').begins_with(PAGE_PREFIX),
+            ProjectionExpression='page_no, page_version, page_bytes, entry_ids'
+        )
+
+    def get_page(self, page_no):
+        response = self.table.get_item(Key={'user_id': self.user_id, 'password_id': page_key(page_no)},
+                                       ConsistentRead=True)
+        item = response.get('Item')
+        return Page.from_item(item, self.encryption_key) if item else Page(page_no)
+
+    def find_page_no(self, entry_id, directory=None):
+        for item in directory if directory is not None else self.directory():
+            if entry_id in item.get('entry_ids', []):
+                return int(item['page_no'])
+        return None
+
+    def get_entry(self, entry_id):
+        page_no = self.find_page_no(entry_id)
+        if page_no is None:
+            return None
+        return self.get_page(page_no).entries.get(entry_id)
+
+    # Writes
+
+    def add(self, entries):
+        """Add entries, filling the emptiest page before starting a new one"""
+        directory = self.directory()
+        pending = list(entries)
+        candidates = sorted((item for item in directory if int(item.get('page_bytes', 0)) < MAX_PAGE_BYTES),
+                            key=lambda item: int(item.get('page_bytes', 0)))
+        for item in candidates:
+            if not pending:
+                break
+            pending = self._fill_page(int(item['page_no']), pending)
+        next_no = max((int(item['page_no']) for item in directory), default=-1) + 1
+        while pending:
+            pending = self._fill_page(next_no, pending)
+            next_no += 1
+
+    def update(self, entry_id, changes):
+        """Apply ``changes`` to an entry; returns the updated entry or None"""
+        page_no = self.find_page_no(entry_id)
+        if page_no is None:
+            return None
+        updated = {}
+
+        def apply(page):
+            entry = page.entries.get(entry_id)
+            if entry is None:
+                return False
+            entry.update(changes)
+            updated.update(entry)
+            return True
+
+        if not self._modify_page(page_no, apply, allow_overflow=False):
+            if not updated:
+                return None
+            # Entry outgrew its page: move it to one with room
+            self.add([updated])
+            self._modify_page(page_no, lambda page: page.entries.pop(entry_id, None) is not None)
+        return updated or None
+
+    def delete(self, entry_id):
+        page_no = self.find_page_no(entry_id)
+        if page_no is None:
+            return False
+        return self._modify_page(page_no, lambda page: page.entries.pop(entry_id, None) is not None)
+
+    def migrate(self, legacy_items, decrypt):
+        """Fold legacy per-entry items into pages and delete them.
+
+        ``decrypt`` turns a legacy item into its plaintext password.
+        Items that can't be decrypted are left where they are.
+        """
+        entries = []
+        for item in legacy_items:
+            try:
+                password = decrypt(item)
+            except ValueError:
+                continue
+            entries.append({
+                'id': item['password_id'],
+                'website': item.get('website', ''),
+                'username': item.get('username', ''),
+                'password': password,
+                'notes': item.get('notes', ''),
+                'folder': item.get('folder', ''),
+                'tags': list(item.get('tags', [])),
+                'created_at': item.get('created_at', ''),
+                'updated_at': item.get('updated_at', item.get('created_at', ''))
+            })
+        if not entries:
+            return []
+        # Pages first, then delete: a crash in between only leaves duplicates
+        self.add(entries)
+        with self.table.batch_writer() as batch:
+            for entry in entries:
+                batch.delete_item(Key={'user_id': self.user_id, 'password_id': entry['id']})
+        return entries
+
+    # Internals
+
+    def _query(self, **kwargs):
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _fill_page(self, page_no, pending):
+        """Put as many pending entries into the page as fit; return the rest"""
+        taken = []
+
+        def apply(page):
+            # Pick a batch by uncompressed size, then halve it until it packs small enough
+            budget = MAX_PAGE_BYTES * 3 - sum(len(json.dumps(entry)) for entry in page.entries.values())
+            batch = []
+            for entry in pending:
+                budget -= len(json.dumps(entry))
+                if budget < 0 and (batch or page.entries):
+                    break
+                batch.append(entry)
+            while batch:
+                trial = {**page.entries, **{entry['id']: entry for entry in batch}}
+                if len(trial) == 1 or len(pack_entries(list(trial.values()), self.encryption_key)) <= MAX_PAGE_BYTES:
+                    page.entries = trial
+                    break
+                batch = batch[:len(batch) // 2]
+            taken[:] = batch
+            return bool(batch)
+
+        self._modify_page(page_no, apply)
+        return pending[len(taken):]
+
+    def _modify_page(self, page_no, apply, allow_overflow=True):
+        for _ in range(WRITE_ATTEMPTS):
+            page = self.get_page(page_no)
+            if not apply(page):
+                return False
+            blob = pack_entries(list(page.entries.values()), self.encryption_key)
+            if not allow_overflow and len(blob) > MAX_PAGE_BYTES and len(page.entries) > 1:
+                return False
+            try:
+                self._write_page(page, blob)
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        raise PageConflict(f"Page {page_no} kept changing during update")
+
+    def _write_page(self, page, blob):
+        key = {'user_id': self.user_id, 'password_id': page_key(page.page_no)}
+        if page.version == 0:
+            condition, values = 'attribute_not_exists(password_id)', {}
+        else:
+            condition, values = 'page_version = :expected', {':expected': page.version}
+
+        if not page.entries:
+            self.table.delete_item(Key=key, ConditionExpression=condition,
+                                   **({'ExpressionAttributeValues': values} if values else {}))
+            return
+
+        self.table.put_item(
+            Item={
+                **key,
+                'page_no': page.page_no,
+                'page_version': page.version + 1,
+                'page_bytes': len(blob),
+                'entry_ids': list(page.entries),
+                'page_blob': blob
+            },
+            ConditionExpression=condition,
+            **({'ExpressionAttributeValues': values} if values else {})
+        )